@@ -0,0 +1,404 @@
+"""Stage benchmarks for the daily fire pipeline on synthetic FIRMS detections
+
+Each run generates clustered, FIRMS-like MODIS and VIIRS detections of every
+requested size over Nepal, as archive CSVs and as the shapefile zips the daily
+feed serves, then times each pipeline stage offline inside a scratch directory
+that links to the bundled resources. Results are written as JSON and compared
+against the committed baseline when it was recorded on the same kind of machine:
+
+    python benchmarks/run_benchmarks.py --sizes 10 1000 100000
+    python benchmarks/run_benchmarks.py --save-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "scripts"))
+sys.path.insert(0, REPO_DIR)
+
+DEFAULT_SIZES = [10, 1_000, 10_000, 100_000, 1_000_000]
+RESULTS_PATH = os.path.join(REPO_DIR, "benchmarks", "results", "latest.json")
+BASELINE_PATH = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+RESULTS_VERSION = 1
+# A stage regresses when it is this much slower (wall time) or hungrier (peak memory) than the baseline...
+TIME_THRESHOLD = 1.25
+MEMORY_THRESHOLD = 1.25
+# ...and the difference is larger than the run-to-run noise of very short stages
+MIN_TIME_DELTA = 0.05  # seconds
+MIN_MEMORY_DELTA = 5.0  # MB
+# Synthetic fires: this many detections per fire cluster, spread over ~1 km around the cluster centre
+DETECTIONS_PER_CLUSTER = 8
+CLUSTER_SPREAD_DEGREES = 0.01
+SYNTHETIC_DATE = "2025-04-15"
+# The feed zips cover South Asia: as many detections again fall outside Nepal for the bbox filter to drop,
+# and they carry the feed's other attributes for the column filter to skip
+SOUTH_ASIA_BOUNDS = (60.0, 5.0, 100.0, 38.0)
+FEED_ONLY_COLUMNS = {"BRIGHTNESS": 320.0, "SCAN": 1.0, "TRACK": 1.0, "SATELLITE": "T", "VERSION": "6.1NRT"}
+# Machine fields that must match the baseline's for timings to be comparable
+MACHINE_KEYS = ("cpu_model", "cpus", "python")
+
+
+def synthetic_detections(n, bounds, seed=0):
+    """FIRMS-like CSV rows for n detections clustered into fires across bounds, half MODIS and half VIIRS"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n // DETECTIONS_PER_CLUSTER)
+    centres = rng.uniform(bounds[:2], bounds[2:], size=(n_clusters, 2))
+    members = rng.integers(0, n_clusters, n)
+    lon_lat = centres[members] + rng.normal(0, CLUSTER_SPREAD_DEGREES, size=(n, 2))
+    hhmm = rng.choice([445, 450, 750, 815, 1630, 1955, 2030], n)
+    frame = pd.DataFrame({
+        "latitude": lon_lat[:, 1].round(5),
+        "longitude": lon_lat[:, 0].round(5),
+        "frp": rng.gamma(1.5, 12.0, n).round(2),
+        "acq_date": SYNTHETIC_DATE,
+        "acq_time": hhmm,
+        "daynight": np.where((hhmm >= 400) & (hhmm < 1200), "D", "N"),
+    })
+    modis = frame.iloc[: n // 2].assign(confidence=rng.integers(0, 101, n // 2))
+    viirs = frame.iloc[n // 2:].assign(confidence=rng.choice(["l", "n", "h"], n - n // 2, p=[0.2, 0.6, 0.2]))
+    return {"MODIS": modis, "VIIRS_SNPP": viirs}
+
+
+def write_feed_zip(frame, path, seed=0):
+    """Write detections as a FIRMS-style shapefile zip, padded with detections elsewhere in South Asia"""
+    import geopandas as gpd
+    from firms_feed import NEPAL_BBOX
+
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(SOUTH_ASIA_BOUNDS[0], SOUTH_ASIA_BOUNDS[2], 4 * len(frame))
+    lat = rng.uniform(SOUTH_ASIA_BOUNDS[1], SOUTH_ASIA_BOUNDS[3], 4 * len(frame))
+    outside = ~((lon >= NEPAL_BBOX[0]) & (lon <= NEPAL_BBOX[2]) & (lat >= NEPAL_BBOX[1]) & (lat <= NEPAL_BBOX[3]))
+    elsewhere = frame.assign(longitude=lon[outside][:len(frame)], latitude=lat[outside][:len(frame)])
+    feed = pd.concat([frame, elsewhere], ignore_index=True)
+    feed.columns = [name.upper() for name in feed.columns]
+    feed = feed.assign(ACQ_TIME=feed["ACQ_TIME"].astype(str).str.zfill(4), **FEED_ONLY_COLUMNS)
+    gdf = gpd.GeoDataFrame(feed, geometry=gpd.points_from_xy(feed["LONGITUDE"], feed["LATITUDE"]), crs="EPSG:4326")
+
+    stem = os.path.splitext(path)[0]
+    shp_dir = stem + "_shp"
+    os.makedirs(shp_dir, exist_ok=True)
+    name = os.path.basename(stem)
+    gdf.to_file(os.path.join(shp_dir, f"{name}.shp"))
+    with zipfile.ZipFile(path, "w") as archive:
+        for member in os.listdir(shp_dir):
+            archive.write(os.path.join(shp_dir, member), member)
+    shutil.rmtree(shp_dir)
+    return path
+
+
+def write_workload(n, bounds, directory):
+    """Write the synthetic detections of one size as archive CSVs and feed zips; return {format: {sensor: path}}"""
+    paths = {"csv": {}, "zip": {}}
+    for sensor, frame in synthetic_detections(n, bounds).items():
+        paths["csv"][sensor] = os.path.join(directory, f"{sensor}_{n}.csv")
+        frame.to_csv(paths["csv"][sensor], index=False)
+        paths["zip"][sensor] = write_feed_zip(frame, os.path.join(directory, f"{sensor}_{n}.zip"))
+    return paths
+
+
+def rows(value):
+    return len(value) if hasattr(value, "__len__") else None
+
+
+class Stages:
+    """The pipeline stages, run in order on one workload; each returns (rows in, rows out)"""
+
+    def __init__(self, sources, date_str):
+        import fire_monitor
+
+        self.fire_monitor = fire_monitor
+        self.sources = sources
+        self.date_str = date_str
+        self.paths = fire_monitor.report_paths(date_str)
+        self.report_date = datetime.strptime(date_str, "%Y%m%d").date()
+
+    def ingest(self):
+        """The daily feed path: the shapefile zips read in place with bbox and column filtering"""
+        from firms_feed import combine_detections, read_detection_file
+
+        self.fire_gdf = combine_detections(
+            read_detection_file(path, sensor) for sensor, path in self.sources["zip"].items()
+        )
+        return None, rows(self.fire_gdf)
+
+    def ingest_csv(self):
+        """The backfill path: archive CSV exports"""
+        from firms_feed import combine_detections, read_detection_file
+
+        fire_gdf = combine_detections(read_detection_file(path, sensor) for sensor, path in self.sources["csv"].items())
+        return None, rows(fire_gdf)
+
+    def attribution(self):
+        from spatial_index import load_attribution_index
+
+        index = load_attribution_index(self.fire_monitor.ATTRIBUTION_LAYERS)
+        self.detections = index.join(self.fire_gdf, self.fire_monitor.ATTRIBUTION_COLUMNS)
+        return rows(self.fire_gdf), rows(self.detections)
+
+    def statistics(self):
+        from detection_stats import confidence_summary, detection_statistics
+
+        fm = self.fire_monitor
+        self.stats = detection_statistics(
+            self.detections, fm.DISTRICT_COLUMN_NAME, fm.LOCAL_UNIT_COLUMN_NAME, fm.PROTECTED_AREA_COLUMN_NAME
+        )
+        self.confidence = confidence_summary(self.stats)
+        self.fire_counts_df, self.total = fm.fire_counts_table(self.stats)
+        return rows(self.detections), len(self.stats["districts"])
+
+    def events(self):
+        from fire_events import cluster_events
+
+        self.events_df = cluster_events(self.detections, self.fire_monitor.DISTRICT_COLUMN_NAME)
+        return rows(self.detections), rows(self.events_df)
+
+    def map_render(self):
+        _, self.map_bytes, self.map_size = self.fire_monitor.export_map(self.fire_gdf, self.paths)
+        return rows(self.fire_gdf), None
+
+    def excel(self):
+        fm = self.fire_monitor
+        fm.export_excel(self.fire_counts_df, self.paths["excel"], fm.protected_area_table(self.stats))
+        fm.export_events(self.events_df, self.paths["events"], self.paths["events_geojson"])
+        return rows(self.fire_counts_df) + rows(self.events_df), None
+
+    def pdf(self):
+        self.fire_monitor.export_pdf(
+            self.paths["pdf"], self.total, self.fire_counts_df, self.map_bytes, self.map_size, self.report_date,
+            "MODIS 1km, VIIRS S-NPP 375m"
+        )
+        return rows(self.fire_counts_df), None
+
+    def web_update(self):
+        from daily_summary import build_summary
+        import update_web_data
+
+        fm = self.fire_monitor
+        fm.export_stats(self.stats, self.paths["stats"])
+        fm.export_confidence(self.confidence, self.paths["confidence"])
+        fm.export_web_layers(self.detections, self.paths["layer"])
+        summary = build_summary(
+            self.date_str, self.stats, self.confidence, self.events_df, "MODIS 1km, VIIRS S-NPP 375m"
+        )
+        fm.export_summary(summary, self.paths["summary"])
+        result = {"summary": summary}
+        if not update_web_data.update_today_json(fire_report=result):
+            raise RuntimeError("update_today_json failed")
+        return rows(self.detections), None
+
+
+STAGE_NAMES = ["ingest", "ingest_csv", "attribution", "statistics", "events", "map_render", "excel", "pdf", "web_update"]
+
+
+def measure(function, trace_memory):
+    """Run function once; return its (rows in, rows out) with wall time, CPU time and optional peak traced memory"""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        rows_in, rows_out = function()
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return {
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_mb": None if peak is None else round(peak, 2),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+    }
+
+
+def run_size(n, sources, stage_names, trace_memory):
+    """Time every stage on one workload, then (if asked) repeat it under tracemalloc for peak memory
+
+    Memory is traced in a second pass because tracemalloc slows allocation-heavy stages.
+    """
+    date_str = datetime.now().strftime("%Y%m%d")
+    timed = Stages(sources, date_str)
+    results = {}
+    for name in stage_names:
+        results[name] = measure(getattr(timed, name), trace_memory=False)
+        print(f"  {n:>9,} {name:<12} {results[name]['wall_s']:8.3f} s")
+    if trace_memory:
+        traced = Stages(sources, date_str)
+        for name in stage_names:
+            results[name]["peak_mb"] = measure(getattr(traced, name), trace_memory=True)["peak_mb"]
+    return results
+
+
+def prepare_workdir(workdir, resources_dir):
+    """Scratch working directory for the pipeline's relative paths, with the resources linked in"""
+    os.makedirs(workdir, exist_ok=True)
+    link = os.path.join(workdir, "resources")
+    if not os.path.exists(link):
+        try:
+            os.symlink(os.path.abspath(resources_dir), link, target_is_directory=True)
+        except OSError:  # No symlink permission (e.g. Windows): copy instead
+            shutil.copytree(resources_dir, link)
+    for directory in ("fire_reports", "data"):
+        os.makedirs(os.path.join(workdir, directory), exist_ok=True)
+
+
+def warm_up(bounds):
+    """Build the spatial index, base map and web boundary caches so no stage is timed doing one-off cache work"""
+    import geopandas as gpd
+    import fire_monitor
+    from spatial_index import load_attribution_index
+
+    from web_layers import boundary_layer
+
+    load_attribution_index(fire_monitor.ATTRIBUTION_LAYERS)
+    boundary_layer(fire_monitor.DISTRICT_PLOT_SHP, fire_monitor.PROTECTED_AREAS_SHP)
+    empty = gpd.GeoDataFrame(geometry=gpd.points_from_xy([bounds[0]], [bounds[1]]), crs="EPSG:4326")
+    fire_monitor.export_map(empty, fire_monitor.report_paths(datetime.now().strftime("%Y%m%d")))
+
+
+def run_benchmarks(sizes, stage_names, resources_dir, trace_memory=True):
+    """Benchmark every size in a temporary directory; return the results document"""
+    resources_dir = os.path.abspath(resources_dir)
+    previous_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="fire_bench_")
+    try:
+        prepare_workdir(workdir, resources_dir)
+        os.chdir(workdir)
+        import fire_monitor
+        from spatial_index import load_polygon_index
+
+        bounds = load_polygon_index(fire_monitor.NEPAL_DISTRICTS_SHP).bounds
+        warm_up(bounds)
+        results = {}
+        for n in sizes:
+            sources = write_workload(n, bounds, workdir)
+            results[str(n)] = run_size(n, sources, stage_names, trace_memory)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "results": results,
+    }
+
+
+def cpu_model():
+    """The CPU's model name where the OS reports one, else its architecture"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info():
+    return {
+        "python": ".".join(platform.python_version_tuple()[:2]),
+        "platform": platform.platform(),
+        "cpu_model": cpu_model(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def machine_differences(machine, baseline_machine):
+    """MACHINE_KEYS on which two results' machines differ, as "key: baseline -> current" strings"""
+    return [
+        f"{key}: {baseline_machine.get(key)} -> {machine.get(key)}"
+        for key in MACHINE_KEYS if machine.get(key) != baseline_machine.get(key)
+    ]
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Return a list of regression messages for stages slower or larger than the baseline beyond the thresholds"""
+    regressions = []
+    for size, stages in results["results"].items():
+        for stage, current in stages.items():
+            previous = baseline.get("results", {}).get(size, {}).get(stage)
+            if previous is None:
+                continue
+            for key, threshold, min_delta, unit in (
+                ("wall_s", time_threshold, MIN_TIME_DELTA, "s"),
+                ("peak_mb", memory_threshold, MIN_MEMORY_DELTA, "MB"),
+            ):
+                now, before = current.get(key), previous.get(key)
+                if now is None or before is None:
+                    continue
+                if now > before * threshold and now - before > min_delta:
+                    regressions.append(
+                        f"{stage} at {int(size):,} detections: {key} {before:.3f} -> {now:.3f} {unit} "
+                        f"({now / before if before else float('inf'):.2f}x)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fire pipeline stages on synthetic FIRMS detections.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="detection counts to benchmark")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_NAMES, default=STAGE_NAMES,
+                        help="stages to run (each needs the stages before it)")
+    parser.add_argument("--resources", default=os.path.join(REPO_DIR, "resources"),
+                        help="directory holding the Nepal shapefiles and icons")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD,
+                        help="wall time ratio over the baseline that counts as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                        help="peak memory ratio over the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    # Stages depend on the outputs of earlier ones, so run everything up to the last requested stage
+    stage_names = STAGE_NAMES[:max(STAGE_NAMES.index(stage) for stage in args.stages) + 1]
+    results = run_benchmarks(sorted(args.sizes), stage_names, args.resources, trace_memory=not args.no_memory)
+
+    from file_utils import write_json_atomic
+
+    write_json_atomic(args.output, results)
+    print(f"Results saved: {args.output}")
+    if args.save_baseline:
+        write_json_atomic(args.baseline, results)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    differences = machine_differences(results["machine"], baseline.get("machine", {}))
+    if differences:
+        print(f"Baseline {args.baseline} was recorded on another machine ({'; '.join(differences)}); not comparing.")
+        print("Pass --baseline with a file saved on this machine by --save-baseline --baseline <file>.")
+        return 0
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,154 @@
+import argparse
 import os
-import subprocess
+import pickle
 import sys
 
-def run_fire_monitor():
-    """Run the fire_monitor.py script to generate today's reports"""
+# Stages import the pipeline modules in-process instead of starting new interpreters
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+STAGE_CACHE_DIR = os.path.join(".cache", "stages")
+# Stages listed when summarizing the run reports
+SUMMARY_TOP_STAGES = 10
+
+
+def run_fire_monitor(inputs):
+    """Run the fire monitoring pipeline to generate today's reports"""
     print("Running fire monitoring script...")
-    fire_monitor_path = os.path.join("scripts", "fire_monitor.py")
-    
-    try:
-        result = subprocess.run([sys.executable, fire_monitor_path], 
-                              check=True, 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE,
-                              universal_newlines=True)
-        print(result.stdout)
-        if result.stderr:
-            print("Warnings/Errors:", result.stderr)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running fire_monitor.py: {e}")
-        print(e.stderr)
-        return False
-
-def update_website_data():
-    """Run the update_web_data.py script to update JSON files"""
+    import fire_monitor
+    return fire_monitor.run()
+
+
+def update_website_data(inputs):
+    """Update the website JSON files from the fire monitor's in-memory results"""
     print("Updating website data...")
+    import update_web_data
+    return update_web_data.update_today_json(fire_report=inputs["fire_monitor"]) or None
+
+
+# Stage name -> (function, stages whose outputs it takes as inputs)
+STAGES = {
+    "fire_monitor": (run_fire_monitor, []),
+    "web_data": (update_website_data, ["fire_monitor"]),
+}
+
+FAILURE_MESSAGES = {
+    "fire_monitor": "Failed to run fire monitoring script.",
+    "web_data": "Failed to update website data.",
+}
+
+
+def stage_cache_path(name):
+    return os.path.join(STAGE_CACHE_DIR, f"{name}.pkl")
+
+
+def save_stage_output(name, output):
+    """Persist a stage's output so the stages after it can be re-run on their own"""
+    os.makedirs(STAGE_CACHE_DIR, exist_ok=True)
+    tmp_path = stage_cache_path(name) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, stage_cache_path(name))
+
+
+def load_stage_output(name):
+    """Load a stage's output saved by an earlier run"""
+    with open(stage_cache_path(name), "rb") as f:
+        return pickle.load(f)
+
+
+def stage_order(names):
+    """Return the given stages preceded by everything they depend on"""
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for dependency in STAGES[name][1]:
+            visit(dependency)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def run_pipeline(only=None):
+    """Run every stage in dependency order, or only one stage with its inputs loaded from the stage cache"""
+    outputs = {}
+    for name in ([only] if only else stage_order(STAGES)):
+        function, dependencies = STAGES[name]
+        for dependency in dependencies:
+            if dependency not in outputs:
+                try:
+                    outputs[dependency] = load_stage_output(dependency)
+                except (OSError, pickle.UnpicklingError, EOFError) as e:
+                    print(f"No cached output for stage '{dependency}' ({e}); run the full update first.")
+                    return 1
+
+        try:
+            output = function({dependency: outputs[dependency] for dependency in dependencies})
+        except Exception as e:
+            print(f"Error in stage '{name}': {e}")
+            output = None
+        if output is None:
+            print(FAILURE_MESSAGES[name])
+            return 1
+
+        outputs[name] = output
+        save_stage_output(name, output)
+
+    print("Daily update completed successfully!")
+    return 0
+
+
+def summarize_runs():
+    """Add up every fire_reports/run_report_*.json, save the totals and print the slowest stages"""
+    from file_utils import write_json_atomic
+    from run_report import RUN_REPORT_SUMMARY_PATH, summarize_run_reports
+
+    summary = summarize_run_reports()
+    if not summary["runs"]:
+        print("No run reports to summarize.")
+        return summary
     try:
-        result = subprocess.run([sys.executable, "update_web_data.py"], 
-                              check=True, 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE,
-                              universal_newlines=True)
-        print(result.stdout)
-        if result.stderr:
-            print("Warnings/Errors:", result.stderr)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error updating website data: {e}")
-        print(e.stderr)
-        return False
+        write_json_atomic(RUN_REPORT_SUMMARY_PATH, summary)
+    except OSError as e:
+        print(f"Run report summary write error: {e}")
+
+    print(f"Stage timings over {summary['runs']} run(s), slowest first:")
+    for name, stage in list(summary["stages"].items())[:SUMMARY_TOP_STAGES]:
+        errors = f", {stage['errors']} failed" if stage["errors"] else ""
+        print(f"  {name:<20} total {stage['wall_s']:8.2f} s  mean {stage['mean_wall_s']:7.2f} s  "
+              f"max {stage['max_wall_s']:7.2f} s  peak RSS {stage['max_peak_rss_mb']:7.1f} MB{errors}")
+    return summary
+
 
 def main():
     """Run the full daily update process"""
+    parser = argparse.ArgumentParser(description="Run the daily Nepal fire update.")
+    parser.add_argument("--stage", choices=list(STAGES),
+                        help="re-run only this stage, using cached outputs of the stages it depends on")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="also write a cProfile dump of every pipeline stage into DIR")
+    parser.add_argument("--summary", action="store_true",
+                        help="only summarize the stage timings of past run reports")
+    args = parser.parse_args()
+    if args.profile:
+        # Read by run_report when it is first imported
+        os.environ["FIRE_PROFILE_DIR"] = os.path.abspath(args.profile)
+
     # Ensure output directories exist
     os.makedirs("fire_reports", exist_ok=True)
     os.makedirs("data", exist_ok=True)
-    
-    # Run fire monitoring script
-    if run_fire_monitor():
-        # Update website data
-        if update_website_data():
-            print("Daily update completed successfully!")
-            return 0
-        else:
-            print("Failed to update website data.")
-            return 1
-    else:
-        print("Failed to run fire monitoring script.")
-        return 1
+
+    if args.summary:
+        summarize_runs()
+        return 0
+
+    status = run_pipeline(only=args.stage)
+    summarize_runs()
+    return status
+
 
 if __name__ == "__main__":
     sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,82 @@
+import json
+import os
+from datetime import datetime
+
+from file_utils import write_json_atomic
+
+# One shard per month (data/archive/YYYY/MM.json) plus a manifest listing the months,
+# so an upsert rewrites at most one month and the web page fetches only what it shows
+ARCHIVE_DIR = os.path.join("data", "archive")
+MANIFEST_PATH = os.path.join(ARCHIVE_DIR, "manifest.json")
+LEGACY_ARCHIVE_PATH = os.path.join("data", "archive.json")
+ARCHIVE_FORMAT_VERSION = 1
+
+
+def shard_path(month):
+    """Path of the shard holding a YYYY-MM month"""
+    year, month_number = month.split("-")
+    return os.path.join(ARCHIVE_DIR, year, f"{month_number}.json")
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    return read_json(manifest_path, {"version": ARCHIVE_FORMAT_VERSION, "months": []})
+
+
+def load_shard(month):
+    """Entries of one month, newest first"""
+    return read_json(shard_path(month), [])
+
+
+def write_month(manifest, month, entries):
+    """Atomically write a month's shard, then its manifest record (the manifest never points at a missing shard)"""
+    entries = sorted(entries, key=lambda entry: entry["date"], reverse=True)
+    path = shard_path(month)
+    write_json_atomic(path, entries)
+
+    months = {record["month"]: record for record in manifest["months"]}
+    months[month] = {
+        "month": month,
+        "path": path.replace("\\", "/"),
+        "count": len(entries),
+        "latest": entries[0]["date"],
+    }
+    manifest["months"] = sorted(months.values(), key=lambda record: record["month"], reverse=True)
+    manifest["version"] = ARCHIVE_FORMAT_VERSION
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+
+
+def migrate_legacy_archive(legacy_path=LEGACY_ARCHIVE_PATH, manifest_path=MANIFEST_PATH):
+    """Split a single-file archive.json into monthly shards if no manifest exists yet; return True if migrated"""
+    if os.path.exists(manifest_path) or not os.path.exists(legacy_path):
+        return False
+    legacy = read_json(legacy_path, [])
+    by_month = {}
+    for entry in legacy:
+        by_month.setdefault(entry["date"][:7], {})[entry["date"]] = entry
+
+    manifest = load_manifest(manifest_path)
+    for month, entries in by_month.items():
+        write_month(manifest, month, entries.values())
+    write_json_atomic(manifest_path, manifest)
+    print(f"Migrated {len(legacy)} archive entries into {len(by_month)} monthly shards")
+    return True
+
+
+def upsert_archive_entry(entry, manifest_path=MANIFEST_PATH):
+    """Insert or replace the entry for entry["date"]; only that month's shard and the manifest are rewritten"""
+    migrate_legacy_archive(manifest_path=manifest_path)
+    month = entry["date"][:7]
+    entries = {existing["date"]: existing for existing in load_shard(month)}
+    entries[entry["date"]] = entry
+
+    manifest = load_manifest(manifest_path)
+    write_month(manifest, month, entries.values())
+    write_json_atomic(manifest_path, manifest)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import shapely
+
+from file_utils import CACHE_DIR, file_sha256, hash_files, write_json_atomic
+
+# Bump when an artifact's layout changes in a way its renderer's source hash would not show
+TEMPLATE_VERSION = 1
+# Outputs stored by content hash (blobs/) and, per artifact input key, which blobs make it up (manifests/)
+ARTIFACT_CACHE_DIR = os.path.join(CACHE_DIR, "artifacts")
+# Entries not hit for this long are pruned, with any blobs no longer referenced
+ARTIFACT_CACHE_MAX_AGE_DAYS = 30
+
+
+def frame_digest(df):
+    """SHA-256 over a DataFrame's column names and values, geometries compared by their WKB"""
+    digest = hashlib.sha256(json.dumps([str(column) for column in df.columns]).encode("utf-8"))
+    for column in df.columns:
+        values = df[column]
+        if getattr(values, "geom_type", None) is not None:
+            digest.update(b"".join(shapely.to_wkb(values.values)))
+            continue
+        if values.dtype == object:
+            values = values.astype(str)
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def artifact_key(name, *inputs, files=()):
+    """Key of one artifact: a digest of its name, TEMPLATE_VERSION, input values or digests and input files"""
+    digest = hashlib.sha256(f"{name}:v{TEMPLATE_VERSION}".encode("utf-8"))
+    for value in inputs:
+        digest.update(str(value).encode("utf-8") + b"\0")
+    if files:
+        digest.update(hash_files(files).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def manifest_path(key, cache_dir=ARTIFACT_CACHE_DIR):
+    return os.path.join(cache_dir, "manifests", f"{key}.json")
+
+
+def blob_path(sha256, cache_dir=ARTIFACT_CACHE_DIR):
+    return os.path.join(cache_dir, "blobs", sha256[:2], sha256)
+
+
+def restore_artifact(key, paths, cache_dir=ARTIFACT_CACHE_DIR):
+    """Make {role: path} hold the outputs cached under key; returns True on a cache hit
+
+    Outputs already identical to the cached ones are left untouched, so their
+    files (and any commit of them) do not change; others are copied back.
+    """
+    try:
+        with open(manifest_path(key, cache_dir)) as f:
+            files = json.load(f)["files"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        return False
+    if set(files) != set(paths):
+        return False
+
+    to_copy = {}
+    for role, path in paths.items():
+        if os.path.exists(path) and file_sha256(path) == files[role]:
+            continue
+        if not os.path.exists(blob_path(files[role], cache_dir)):
+            return False
+        to_copy[path] = blob_path(files[role], cache_dir)
+
+    for path, blob in to_copy.items():
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(blob, tmp_path)
+        os.replace(tmp_path, path)
+    # Marks the entry as used for pruning
+    os.utime(manifest_path(key, cache_dir))
+    return True
+
+
+def store_artifact(key, paths, cache_dir=ARTIFACT_CACHE_DIR):
+    """Copy the outputs {role: path} into the blob store and record them under key"""
+    files = {}
+    for role, path in paths.items():
+        sha256 = file_sha256(path)
+        blob = blob_path(sha256, cache_dir)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp_path = f"{blob}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, blob)
+        files[role] = sha256
+    write_json_atomic(manifest_path(key, cache_dir), {"key": key, "files": files})
+
+
+def prune_artifact_cache(max_age_days=ARTIFACT_CACHE_MAX_AGE_DAYS, cache_dir=ARTIFACT_CACHE_DIR):
+    """Drop entries not hit for max_age_days and the blobs only they referenced; returns the entries removed"""
+    manifests_dir = os.path.join(cache_dir, "manifests")
+    if not os.path.isdir(manifests_dir):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    referenced = set()
+    for name in os.listdir(manifests_dir):
+        path = os.path.join(manifests_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+                continue
+            with open(path) as f:
+                referenced.update(json.load(f)["files"].values())
+        except (OSError, json.JSONDecodeError, KeyError):
+            continue
+    if removed:
+        blobs_dir = os.path.join(cache_dir, "blobs")
+        for root, _, names in os.walk(blobs_dir):
+            for name in names:
+                if name not in referenced:
+                    os.remove(os.path.join(root, name))
+    return removed
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import fire_monitor
+from artifact_cache import prune_artifact_cache
+from daily_summary import load_summary
+from detection_store import DetectionStore
+from file_utils import CACHE_DIR, write_json_atomic
+from firms_feed import combine_detections, read_detection_file, satellite_label, sensor_from_name
+from spatial_index import load_attribution_index
+
+# Days finished by earlier runs, so an interrupted backfill resumes where it stopped
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "backfill_checkpoint.json")
+# YYYY-MM-DD, YYYY_MM_DD or YYYYMMDD anywhere in an archive file name
+ARCHIVE_DATE_PATTERN = re.compile(r"(?<!\d)(\d{4})[-_]?(\d{2})[-_]?(\d{2})(?!\d)")
+ARCHIVE_EXTENSIONS = (".zip", ".csv")
+
+
+def find_archive_files(archive_dir):
+    """Map YYYYMMDD -> {sensor: path} for every FIRMS zip or CSV in archive_dir with a date in its name
+
+    The sensor is taken from the file name, so one day can combine MODIS and VIIRS files.
+    """
+    sources = {}
+    for name in sorted(os.listdir(archive_dir)):
+        if os.path.splitext(name)[1].lower() not in ARCHIVE_EXTENSIONS:
+            continue
+        match = ARCHIVE_DATE_PATTERN.search(name)
+        if not match:
+            continue
+        try:
+            date_str = datetime.strptime("".join(match.groups()), "%Y%m%d").strftime("%Y%m%d")
+        except ValueError:
+            continue
+        day_sources = sources.setdefault(date_str, {})
+        sensor = sensor_from_name(name)
+        if sensor in day_sources:
+            print(f"Several {sensor} files for {date_str}; using {os.path.basename(day_sources[sensor])}")
+            continue
+        day_sources[sensor] = os.path.join(archive_dir, name)
+    return sources
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"completed": {}}
+
+
+def date_range(start, end):
+    day = start
+    while day <= end:
+        yield day.strftime("%Y%m%d")
+        day += timedelta(days=1)
+
+
+def warm_caches(stats_only):
+    """Build the spatial index, base map and web boundary layer once, before workers would race to build them"""
+    load_attribution_index(fire_monitor.ATTRIBUTION_LAYERS)
+    if not stats_only:
+        import geopandas as gpd
+        from fire_map import plot_fire_map
+        from web_layers import boundary_layer
+
+        boundary_layer(fire_monitor.DISTRICT_PLOT_SHP, fire_monitor.PROTECTED_AREAS_SHP)
+        plot_fire_map(
+            gpd.GeoDataFrame(geometry=[], crs="EPSG:4326"),
+            fire_monitor.DISTRICT_PLOT_SHP,
+            fire_monitor.PROTECTED_AREAS_SHP,
+            fire_monitor.FIRE_ICON_PATH,
+            fire_monitor.NORTH_ARROW_PATH
+        )
+
+
+def backfill_day(date_str, sources, stats_only=False):
+    """Build one archived day's reports inside a pool worker and return its totals and attributed detections"""
+    fire_gdf = combine_detections(read_detection_file(path, sensor) for sensor, path in sources.items())
+    if fire_gdf is None:
+        raise ValueError(f"no readable detections in {', '.join(sources.values())}")
+
+    # Artifacts are written serially here; the parallelism is across days. The parent prunes the artifact cache.
+    result = fire_monitor.process_detections(
+        fire_gdf, date_str, stats_only=stats_only, workers=1, record=False, show_pdf=False,
+        satellite=satellite_label(sources), prune=False
+    )
+    if result is None:
+        raise RuntimeError("processing stopped early")
+    missing = [path for path in result["outputs"].values() if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"missing outputs: {', '.join(missing)}")
+    return {"total_fires": result["total_fires"], "outputs": result["outputs"], "detections": result["detections"]}
+
+
+def backfill(start, end, archive_dir, workers=None, stats_only=False, checkpoint_path=CHECKPOINT_PATH):
+    """Rebuild the reports for every archived day in [start, end] across a process pool; return the failed dates
+
+    Only the parent process writes the detection store and the checkpoint, one
+    finished day at a time, so stopping the run loses at most the days in flight.
+    """
+    os.makedirs(fire_monitor.OUTPUT_FOLDER, exist_ok=True)
+    sources = find_archive_files(archive_dir)
+    checkpoint = load_checkpoint(checkpoint_path)
+    completed = checkpoint.setdefault("completed", {})
+
+    pending = []
+    for date_str in date_range(start, end):
+        if date_str not in sources:
+            print(f"No archive file for {date_str}")
+            continue
+        outputs = fire_monitor.report_outputs(fire_monitor.report_paths(date_str), stats_only)
+        if date_str in completed and all(os.path.exists(path) for path in outputs.values()):
+            continue
+        pending.append(date_str)
+    print(f"{len(pending)} days to backfill, {len(completed)} already in the checkpoint")
+    if not pending:
+        return []
+
+    warm_caches(stats_only)
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor, DetectionStore() as store:
+        futures = {
+            executor.submit(backfill_day, date_str, sources[date_str], stats_only): date_str
+            for date_str in pending
+        }
+        for future in as_completed(futures):
+            date_str = futures[future]
+            try:
+                summary = future.result()
+                store.write_day(date_str, **summary["detections"])
+            except Exception as e:
+                print(f"Backfill error for {date_str}: {e}")
+                failed.append(date_str)
+                continue
+
+            completed[date_str] = {
+                "sources": sources[date_str],
+                "total_fires": summary["total_fires"],
+                "outputs": summary["outputs"],
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            write_json_atomic(checkpoint_path, checkpoint)
+            print(f"Backfilled {date_str}: {summary['total_fires']} fires")
+
+    if not stats_only:
+        try:
+            prune_artifact_cache()
+        except OSError as e:
+            print(f"Artifact cache prune warning: {e}")
+    return sorted(failed)
+
+
+def pdf_report_job(date_str, satellite=None):
+    """generate_fire_report_pdf arguments for a day from its daily summary and map, or None if either is missing
+
+    The PDF names the summary's own satellite unless satellite overrides it.
+    """
+    from fire_report import report_dates
+
+    paths = fire_monitor.report_paths(date_str)
+    # Days rendered before the PDF variant existed fall back to the print master, resampled once
+    map_path = paths["map_pdf"] if os.path.exists(paths["map_pdf"]) else paths["map"]
+    if not (os.path.exists(paths["summary"]) and os.path.exists(map_path)):
+        return None
+    try:
+        summary = load_summary(paths["summary"])
+    except ValueError as e:
+        print(f"Skipping {date_str}: {e}")
+        return None
+    fire_counts_df, total_fire_count = fire_monitor.fire_counts_table(
+        {"districts": {district: {"count": count} for district, count in summary["districts"].items()}}
+    )
+    english_date, nepali_date = report_dates(datetime.strptime(date_str, "%Y%m%d").date())
+    return {
+        "pdf_path": paths["pdf"],
+        "fire_count": int(total_fire_count),
+        "english_date": english_date,
+        "nepali_date": nepali_date,
+        # The summary's write time stands in for when the day was assessed
+        "assessed_time": datetime.fromtimestamp(os.path.getmtime(paths["summary"])).strftime("%I:%M %p"),
+        "fire_map": map_path,
+        "fire_counts_df": fire_counts_df,
+        "satellite": satellite or summary["satellite"],
+    }
+
+
+def rebuild_pdfs(start, end, satellite=None):
+    """Regenerate the PDF of every day in [start, end] that has a summary and map, in this process; return the count"""
+    from fire_report import generate_fire_reports_pdf
+
+    jobs = []
+    for date_str in date_range(start, end):
+        job = pdf_report_job(date_str, satellite)
+        if job is None:
+            print(f"No summary or map for {date_str}")
+            continue
+        jobs.append(job)
+    return len(generate_fire_reports_pdf(jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild Nepal fire reports for a range of archived FIRMS days.")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("--archive-dir",
+                        help="directory of FIRMS zips or CSVs with the day's date in each file name")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="only write district counts and confidence JSON; skip the Excel, map and PDF")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="checkpoint file used to resume")
+    parser.add_argument("--pdf-only", action="store_true",
+                        help="only rebuild the PDFs from each day's existing summary and map")
+    parser.add_argument("--satellite",
+                        help="satellite line printed on rebuilt PDFs instead of each day's own (with --pdf-only)")
+    args = parser.parse_args()
+
+    if args.pdf_only:
+        started = time.perf_counter()
+        count = rebuild_pdfs(args.start, args.end, args.satellite)
+        print(f"Rebuilt {count} PDFs in {time.perf_counter() - started:.1f} s")
+        return 0
+    if not args.archive_dir:
+        parser.error("--archive-dir is required unless --pdf-only is given")
+
+    failed = backfill(args.start, args.end, args.archive_dir, workers=args.workers,
+                      stats_only=args.stats_only, checkpoint_path=args.checkpoint)
+    if failed:
+        print(f"{len(failed)} days failed: {', '.join(failed)}; re-run to retry them.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
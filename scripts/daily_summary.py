@@ -0,0 +1,60 @@
+import json
+import os
+
+# Bump when a field is renamed or its meaning changes; readers reject other versions
+SUMMARY_VERSION = 1
+SUMMARY_DIR = "fire_reports"
+
+
+def summary_path(date_str):
+    """Path of the summary for a YYYYMMDD date"""
+    return os.path.join(SUMMARY_DIR, f"fire_summary_{date_str}.json")
+
+
+def event_summary(events):
+    """Count and largest event (events come largest first) of a fire events table"""
+    if not len(events):
+        return {"count": 0, "largest": None}
+    largest = events.iloc[0]
+    district = largest["District"]
+    return {
+        "count": len(events),
+        "largest": {
+            # Missing districts are NaN in the table
+            "district": district if isinstance(district, str) else None,
+            "detections": int(largest["Detections"]),
+        },
+    }
+
+
+def build_summary(date_str, stats, confidence, events, satellite):
+    """The day's canonical summary: per-district counts (largest first), totals, top district, confidence and events
+
+    The Excel table, the PDF and today.json are renderings of it.
+    """
+    districts = dict(sorted(
+        ((district, int(district_stats["count"])) for district, district_stats in stats["districts"].items()),
+        key=lambda item: item[1], reverse=True
+    ))
+    protected_areas = {area: int(count) for area, count in stats.get("protected_areas", {}).items()}
+    top_district = next(iter(districts.items()), None)
+    return {
+        "version": SUMMARY_VERSION,
+        "date": date_str,
+        "satellite": satellite,
+        "total_fires": sum(districts.values()),
+        "top_district": {"name": top_district[0], "count": top_district[1]} if top_district else None,
+        "districts": districts,
+        "protected_areas": protected_areas,
+        "confidence": confidence,
+        "events": event_summary(events),
+    }
+
+
+def load_summary(path):
+    """Read a summary written by build_summary; raises ValueError for another SUMMARY_VERSION"""
+    with open(path) as f:
+        summary = json.load(f)
+    if summary.get("version") != SUMMARY_VERSION:
+        raise ValueError(f"{path} is summary version {summary.get('version')}, expected {SUMMARY_VERSION}")
+    return summary
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+# Confidence classes used by the reports: low < 30 <= medium < 80 <= high
+CONFIDENCE_CLASS_EDGES = [30, 80]
+CONFIDENCE_CLASSES = ("low", "medium", "high")
+CONFIDENCE_PERCENTILES = (10, 25, 50, 75, 90)
+STATS_VERSION = 2
+
+
+def grouped_percentiles(codes, values, n_groups, percentiles):
+    """Linear-interpolated percentiles of values per group code from a single sort; NaN for empty groups"""
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    sizes = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    result = np.full((n_groups, len(percentiles)), np.nan)
+    present = sizes > 0
+    for column, percentile in enumerate(percentiles):
+        position = (sizes[present] - 1) * percentile / 100
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low_values = sorted_values[starts[present] + lower]
+        high_values = sorted_values[starts[present] + upper]
+        result[present, column] = low_values + (high_values - low_values) * (position - lower)
+    return result
+
+
+def number(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def group_summary(count, confidence_count, confidence_sum, percentiles, classes, frp_sum, frp_max, day, night):
+    confidence = None
+    if confidence_count:
+        confidence = {
+            "count": int(confidence_count),
+            "average": number(confidence_sum / confidence_count),
+            "percentiles": {str(p): number(v) for p, v in zip(CONFIDENCE_PERCENTILES, percentiles)},
+            "histogram": dict(zip(CONFIDENCE_CLASSES, (int(c) for c in classes))),
+        }
+    return {
+        "count": int(count),
+        "confidence": confidence,
+        "frp": {"sum": number(frp_sum), "max": number(frp_max)} if frp_sum is not None else None,
+        "daynight": {"day": int(day), "night": int(night)} if day is not None else None,
+    }
+
+
+def area_counts(keys):
+    """Detection counts per non-missing key (a column, or several columns for nested keys), largest first"""
+    return {key: int(count) for key, count in keys.value_counts().items()}
+
+
+def detection_statistics(detections, district_column, local_unit_column=None, protected_area_column=None):
+    """Per-district and national detection statistics computed in one vectorized grouped pass
+
+    Counts, confidence histograms and percentiles, FRP sum/max and the day/night
+    split come from bincounts over district codes; national figures are summed
+    from the district aggregates, except percentiles which need one more sort.
+    Rows without a district are left out, matching the district counts.
+    Optional local unit (GaPa/NaPa) counts are nested under each district and
+    protected area counts are reported alongside the national figures.
+    """
+    detections = detections[detections[district_column].notna()]
+    codes, districts = pd.factorize(detections[district_column], sort=True)
+    n_groups = len(districts)
+    counts = np.bincount(codes, minlength=n_groups)
+
+    def column(name):
+        return detections[name].to_numpy(dtype=np.float64) if name in detections.columns else None
+
+    confidence = column("CONFIDENCE")
+    if confidence is not None:
+        valid = ~np.isnan(confidence)
+        valid_codes, valid_confidence = codes[valid], confidence[valid]
+        confidence_counts = np.bincount(valid_codes, minlength=n_groups)
+        confidence_sums = np.bincount(valid_codes, weights=valid_confidence, minlength=n_groups)
+        classes = np.digitize(valid_confidence, CONFIDENCE_CLASS_EDGES)
+        histograms = np.bincount(
+            valid_codes * len(CONFIDENCE_CLASSES) + classes, minlength=n_groups * len(CONFIDENCE_CLASSES)
+        ).reshape(n_groups, len(CONFIDENCE_CLASSES))
+        district_percentiles = grouped_percentiles(valid_codes, valid_confidence, n_groups, CONFIDENCE_PERCENTILES)
+        national_percentiles = grouped_percentiles(
+            np.zeros(len(valid_confidence), dtype=np.int64), valid_confidence, 1, CONFIDENCE_PERCENTILES
+        )[0]
+    else:
+        confidence_counts = np.zeros(n_groups, dtype=np.int64)
+        confidence_sums = np.zeros(n_groups)
+        histograms = np.zeros((n_groups, len(CONFIDENCE_CLASSES)), dtype=np.int64)
+        district_percentiles = np.full((n_groups, len(CONFIDENCE_PERCENTILES)), np.nan)
+        national_percentiles = np.full(len(CONFIDENCE_PERCENTILES), np.nan)
+
+    frp = column("FRP")
+    if frp is not None:
+        frp = np.nan_to_num(frp)
+        frp_sums = np.bincount(codes, weights=frp, minlength=n_groups)
+        frp_maxes = np.full(n_groups, np.nan)
+        np.fmax.at(frp_maxes, codes, frp)
+    else:
+        frp_sums = frp_maxes = [None] * n_groups
+
+    has_daynight = "DAYNIGHT" in detections.columns
+    if has_daynight:
+        is_day = (detections["DAYNIGHT"].astype(str).str.upper() == "D").to_numpy()
+        days = np.bincount(codes, weights=is_day, minlength=n_groups).astype(np.int64)
+        nights = counts - days
+    else:
+        days = nights = [None] * n_groups
+
+    district_stats = {
+        str(district): group_summary(
+            counts[i], confidence_counts[i], confidence_sums[i], district_percentiles[i], histograms[i],
+            frp_sums[i], frp_maxes[i], days[i], nights[i]
+        )
+        for i, district in enumerate(districts)
+    }
+    national = group_summary(
+        counts.sum(), confidence_counts.sum(), confidence_sums.sum(), national_percentiles, histograms.sum(axis=0),
+        frp_sums.sum() if frp is not None else None,
+        frp_maxes.max() if frp is not None and n_groups else np.nan,
+        days.sum() if has_daynight else None, nights.sum() if has_daynight else None
+    )
+    if local_unit_column is not None and local_unit_column in detections.columns:
+        for (district, unit), count in area_counts(detections[[district_column, local_unit_column]]).items():
+            district_stats[str(district)].setdefault("local_units", {})[str(unit)] = count
+    stats = {"version": STATS_VERSION, "national": national, "districts": district_stats}
+    if protected_area_column is not None and protected_area_column in detections.columns:
+        stats["protected_areas"] = {str(area): count for area, count in area_counts(detections[protected_area_column]).items()}
+    return stats
+
+
+def confidence_summary(stats):
+    """The fire_confidence JSON shape used by the website, derived from the national statistics"""
+    confidence = stats["national"]["confidence"]
+    if confidence is None:
+        return {
+            "average": 0,
+            "median": 0,
+            "high_confidence_pct": 0,
+            "confidence_distribution": dict.fromkeys(CONFIDENCE_CLASSES, 0),
+        }
+    return {
+        "average": round(confidence["average"]),
+        "median": round(confidence["percentiles"]["50"]),
+        "high_confidence_pct": round(confidence["histogram"]["high"] / confidence["count"] * 100),
+        "confidence_distribution": confidence["histogram"],
+    }
+
+
+def sorted_percentiles(values, percentiles):
+    """Linear-interpolated percentiles of an already sorted array, computed as grouped_percentiles does"""
+    if not len(values):
+        return np.full(len(percentiles), np.nan)
+    position = (len(values) - 1) * np.asarray(percentiles) / 100
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def sorted_insert(values, new):
+    """Merge new values into a sorted array without re-sorting it"""
+    new = np.sort(new)
+    return np.insert(values, np.searchsorted(values, new), new)
+
+
+def sorted_remove(values, old):
+    """Remove one occurrence of each old value from a sorted array"""
+    old = np.sort(old)
+    # Repeated values are removed from consecutive positions
+    positions = np.searchsorted(values, old) + np.arange(len(old)) - np.searchsorted(old, old)
+    return np.delete(values, positions)
+
+
+def add_counts(counts, value_counts, sign):
+    for key, count in value_counts.items():
+        total = counts.get(str(key), 0) + sign * int(count)
+        if total:
+            counts[str(key)] = total
+        else:
+            counts.pop(str(key), None)
+
+
+def largest_first(counts):
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+class RunningStatistics:
+    """detection_statistics kept current as detections are added and removed, touching only the changed rows
+
+    Counts, confidence sums and histograms, FRP sums, the day/night split and
+    local unit and protected area counts are adjusted by each delta. Percentiles
+    and FRP maxima come from per-district sorted arrays that the delta is merged
+    into, and only the districts it touched are summarized again.
+    """
+
+    def __init__(self, district_column, local_unit_column=None, protected_area_column=None):
+        self.district_column = district_column
+        self.local_unit_column = local_unit_column
+        self.protected_area_column = protected_area_column
+        # Optional columns, fixed by the first rows seen, decide which figures are reported as in detection_statistics
+        self.columns = None
+        self.groups = {}
+        self.summaries = {}
+        self.national_confidence = np.empty(0)
+        self.protected_areas = {}
+
+    def update(self, added=None, removed=None):
+        """Apply detections added to and removed from the day"""
+        for detections, sign in ((added, 1), (removed, -1)):
+            if detections is None or detections.empty:
+                continue
+            if self.columns is None:
+                self.columns = set(detections.columns)
+            detections = detections[detections[self.district_column].notna()]
+            if self.protected_area_column in self.columns:
+                add_counts(self.protected_areas, detections[self.protected_area_column].value_counts(), sign)
+            for district, rows in detections.groupby(self.district_column, sort=False, observed=True):
+                self.update_group(str(district), rows, sign)
+
+    def update_group(self, district, rows, sign):
+        group = self.groups.setdefault(district, {
+            "count": 0, "confidence": np.empty(0), "confidence_sum": 0.0,
+            "histogram": np.zeros(len(CONFIDENCE_CLASSES), dtype=np.int64), "frp": np.empty(0), "frp_sum": 0.0,
+            "day": 0, "local_units": {},
+        })
+        merge = sorted_insert if sign > 0 else sorted_remove
+        group["count"] += sign * len(rows)
+        if "CONFIDENCE" in self.columns:
+            confidence = rows["CONFIDENCE"].to_numpy(dtype=np.float64)
+            confidence = confidence[~np.isnan(confidence)]
+            group["confidence"] = merge(group["confidence"], confidence)
+            self.national_confidence = merge(self.national_confidence, confidence)
+            group["confidence_sum"] += sign * confidence.sum()
+            group["histogram"] += sign * np.bincount(
+                np.digitize(confidence, CONFIDENCE_CLASS_EDGES), minlength=len(CONFIDENCE_CLASSES)
+            )
+        if "FRP" in self.columns:
+            frp = np.nan_to_num(rows["FRP"].to_numpy(dtype=np.float64))
+            group["frp"] = merge(group["frp"], frp)
+            group["frp_sum"] += sign * frp.sum()
+        if "DAYNIGHT" in self.columns:
+            group["day"] += sign * int((rows["DAYNIGHT"].astype(str).str.upper() == "D").sum())
+        if self.local_unit_column in self.columns:
+            add_counts(group["local_units"], rows[self.local_unit_column].value_counts(), sign)
+
+        self.summaries.pop(district, None)
+        if group["count"] <= 0:
+            del self.groups[district]
+
+    def summarize(self, group):
+        has_frp = "FRP" in self.columns
+        has_daynight = "DAYNIGHT" in self.columns
+        summary = group_summary(
+            group["count"], len(group["confidence"]), group["confidence_sum"],
+            sorted_percentiles(group["confidence"], CONFIDENCE_PERCENTILES), group["histogram"],
+            group["frp_sum"] if has_frp else None, group["frp"][-1] if has_frp else None,
+            group["day"] if has_daynight else None, group["count"] - group["day"] if has_daynight else None
+        )
+        if group["local_units"]:
+            summary["local_units"] = largest_first(group["local_units"])
+        return summary
+
+    def statistics(self):
+        """The day's statistics, in detection_statistics' shape"""
+        columns = self.columns or set()
+        for district, group in self.groups.items():
+            if district not in self.summaries:
+                self.summaries[district] = self.summarize(group)
+        groups = self.groups.values()
+        has_frp = "FRP" in columns
+        has_daynight = "DAYNIGHT" in columns
+        national = group_summary(
+            sum(group["count"] for group in groups), len(self.national_confidence),
+            sum(group["confidence_sum"] for group in groups),
+            sorted_percentiles(self.national_confidence, CONFIDENCE_PERCENTILES),
+            sum((group["histogram"] for group in groups), np.zeros(len(CONFIDENCE_CLASSES), dtype=np.int64)),
+            sum(group["frp_sum"] for group in groups) if has_frp else None,
+            max((group["frp"][-1] for group in groups), default=np.nan) if has_frp else np.nan,
+            sum(group["day"] for group in groups) if has_daynight else None,
+            sum(group["count"] - group["day"] for group in groups) if has_daynight else None
+        )
+        stats = {
+            "version": STATS_VERSION,
+            "national": national,
+            "districts": {district: self.summaries[district] for district in sorted(self.groups)},
+        }
+        if self.protected_area_column is not None and self.protected_area_column in columns:
+            stats["protected_areas"] = largest_first(self.protected_areas)
+        return stats
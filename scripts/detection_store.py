@@ -0,0 +1,248 @@
+import glob
+import os
+import sqlite3
+from datetime import datetime
+
+from daily_summary import SUMMARY_DIR, load_summary
+from file_utils import CACHE_DIR
+from trend_engine import TREND_SCHEMA, recompute_trends, trend_summary, update_trends
+
+# Kept under the pipeline cache (persisted between workflow runs) rather than the published data/ directory.
+# The cache can be evicted, so a missing store is rebuilt from the committed daily summaries.
+DETECTION_STORE_PATH = os.path.join(CACHE_DIR, "detections.sqlite")
+LEGACY_DETECTION_STORE_PATH = os.path.join("data", "detections.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    date TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    date TEXT NOT NULL,
+    district TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    confidence REAL,
+    frp REAL,
+    acq_date TEXT,
+    acq_time TEXT,
+    sensor TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_date ON detections (date);
+CREATE INDEX IF NOT EXISTS idx_detections_district_date ON detections (district, date);
+CREATE TABLE IF NOT EXISTS district_counts (
+    date TEXT NOT NULL,
+    district TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (district, date)
+);
+CREATE INDEX IF NOT EXISTS idx_district_counts_date ON district_counts (date);
+"""
+
+
+def iso_date(date):
+    """Normalise a date, YYYYMMDD string or YYYY-MM-DD string to YYYY-MM-DD"""
+    if hasattr(date, "strftime"):
+        return date.strftime("%Y-%m-%d")
+    if len(date) == 8 and date.isdigit():
+        return f"{date[:4]}-{date[4:6]}-{date[6:]}"
+    return date
+
+
+def migrate_legacy_store(legacy_path=LEGACY_DETECTION_STORE_PATH, path=DETECTION_STORE_PATH):
+    """Move a store left in data/ by earlier runs to path if none exists there yet; return True if moved"""
+    if os.path.exists(path) or not os.path.exists(legacy_path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(legacy_path, path)
+    print(f"Moved detection store from {legacy_path} to {path}")
+    return True
+
+
+class DetectionStore:
+    """Date-partitioned SQLite store of attributed detections with per-day and per-district rollups"""
+
+    def __init__(self, path=DETECTION_STORE_PATH, summary_dir=SUMMARY_DIR):
+        """Open the store at path; a new store at the default path is rebuilt from the summaries in summary_dir"""
+        if path == DETECTION_STORE_PATH:
+            migrate_legacy_store()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        created = not os.path.exists(path)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA + TREND_SCHEMA)
+        # Stores created before multi-sensor ingestion have no sensor column
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(detections)")]
+        if "sensor" not in columns:
+            self.conn.execute("ALTER TABLE detections ADD COLUMN sensor TEXT")
+        if created and path == DETECTION_STORE_PATH:
+            days = self.rebuild_from_summaries(summary_dir)
+            print(f"Detection store {path} was missing; recreated it with {days} days of history from {summary_dir}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def detection_rows(date, districts, longitudes, latitudes, confidence=None, frp=None,
+                       acq_date=None, acq_time=None, sensor=None):
+        """Rows of the detections table, in column order, for write_day's keyword columns"""
+        count = len(districts)
+        missing = [None] * count
+        return list(zip(
+            [date] * count, districts, latitudes, longitudes,
+            confidence if confidence is not None else missing,
+            frp if frp is not None else missing,
+            acq_date if acq_date is not None else missing,
+            acq_time if acq_time is not None else missing,
+            sensor if sensor is not None else missing,
+        ))
+
+    def write_day(self, date, districts, longitudes, latitudes, confidence=None, frp=None,
+                  acq_date=None, acq_time=None, sensor=None):
+        """Replace the partition for date with the given detections (re-ingesting a day is idempotent)"""
+        date = iso_date(date)
+        count = len(districts)
+        rows = self.detection_rows(date, districts, longitudes, latitudes, confidence, frp, acq_date, acq_time, sensor)
+        district_totals = {}
+        for district in districts:
+            district_totals[district] = district_totals.get(district, 0) + 1
+
+        with self.conn:
+            self.conn.execute("DELETE FROM detections WHERE date = ?", (date,))
+            self.conn.execute("DELETE FROM district_counts WHERE date = ?", (date,))
+            self.conn.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT INTO district_counts VALUES (?, ?, ?)",
+                [(date, district, total) for district, total in district_totals.items()]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO days VALUES (?, ?, ?)",
+                (date, count, datetime.now().isoformat(timespec="seconds"))
+            )
+            update_trends(self.conn, date)
+
+    def update_day(self, date, added=None, removed=None):
+        """Insert added and delete removed detections (each write_day's keyword columns) in date's partition
+
+        The district and day rollups are adjusted by the difference, so a
+        poll that brings a few detections does not rewrite the whole day.
+        """
+        date = iso_date(date)
+        added_rows = self.detection_rows(date, **added) if added else []
+        removed_rows = self.detection_rows(date, **removed) if removed else []
+        district_changes = {}
+        for rows, sign in ((added_rows, 1), (removed_rows, -1)):
+            for row in rows:
+                district_changes[row[1]] = district_changes.get(row[1], 0) + sign
+
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM detections WHERE rowid = (SELECT rowid FROM detections WHERE date = ? AND district = ?"
+                " AND latitude = ? AND longitude = ? AND confidence IS ? AND frp IS ? AND acq_date IS ?"
+                " AND acq_time IS ? AND sensor IS ? LIMIT 1)",
+                removed_rows
+            )
+            self.conn.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", added_rows)
+            self.conn.executemany(
+                "INSERT INTO district_counts VALUES (?, ?, ?)"
+                " ON CONFLICT (district, date) DO UPDATE SET count = count + excluded.count",
+                [(date, district, change) for district, change in district_changes.items() if change]
+            )
+            self.conn.execute("DELETE FROM district_counts WHERE date = ? AND count <= 0", (date,))
+            self.conn.execute(
+                "INSERT INTO days VALUES (?, ?, ?)"
+                " ON CONFLICT (date) DO UPDATE SET total = total + excluded.total, ingested_at = excluded.ingested_at",
+                (date, len(added_rows) - len(removed_rows), datetime.now().isoformat(timespec="seconds"))
+            )
+            update_trends(self.conn, date)
+
+    def rebuild_from_summaries(self, summary_dir=SUMMARY_DIR):
+        """Restore the day and district rollups and the trends from the daily summary JSON files; returns the days restored
+
+        The individual detections are not in the summaries, so only the rollups
+        the trends and district series read from come back.
+        """
+        days = []
+        district_rows = []
+        ingested_at = datetime.now().isoformat(timespec="seconds")
+        for path in sorted(glob.glob(os.path.join(summary_dir, "fire_summary_*.json"))):
+            try:
+                summary = load_summary(path)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            date = iso_date(summary["date"])
+            days.append((date, summary["total_fires"], ingested_at))
+            district_rows += [(date, district, count) for district, count in summary["districts"].items()]
+
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO days VALUES (?, ?, ?)", days)
+            self.conn.executemany("INSERT OR REPLACE INTO district_counts VALUES (?, ?, ?)", district_rows)
+        recompute_trends(self.conn)
+        return len(days)
+
+    def day_total(self, date):
+        """Return the total detections for an ingested date, or None if the date was never ingested"""
+        row = self.conn.execute("SELECT total FROM days WHERE date = ?", (iso_date(date),)).fetchone()
+        return row[0] if row else None
+
+    def previous_day(self, date):
+        """Return (date, total) for the latest ingested date before date, or None"""
+        return self.conn.execute(
+            "SELECT date, total FROM days WHERE date < ? ORDER BY date DESC LIMIT 1", (iso_date(date),)
+        ).fetchone()
+
+    def daily_totals(self, start, end):
+        """Return [(date, total)] for every ingested date in [start, end]"""
+        return self.conn.execute(
+            "SELECT date, total FROM days WHERE date BETWEEN ? AND ? ORDER BY date",
+            (iso_date(start), iso_date(end))
+        ).fetchall()
+
+    def total(self, start, end):
+        """Return the number of detections between start and end inclusive"""
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(total), 0) FROM days WHERE date BETWEEN ? AND ?", (iso_date(start), iso_date(end))
+        ).fetchone()
+        return row[0]
+
+    def district_series(self, district, start, end):
+        """Return [(date, count)] for one district over the ingested dates in [start, end]"""
+        return self.conn.execute(
+            "SELECT d.date, COALESCE(c.count, 0) FROM days d "
+            "LEFT JOIN district_counts c ON c.date = d.date AND c.district = ? "
+            "WHERE d.date BETWEEN ? AND ? ORDER BY d.date",
+            (district, iso_date(start), iso_date(end))
+        ).fetchall()
+
+    def district_totals(self, start, end):
+        """Return [(district, count)] summed over [start, end], largest first"""
+        return self.conn.execute(
+            "SELECT district, SUM(count) AS total FROM district_counts WHERE date BETWEEN ? AND ? "
+            "GROUP BY district ORDER BY total DESC",
+            (iso_date(start), iso_date(end))
+        ).fetchall()
+
+    def trends(self, date):
+        """Return the rolling trend summary for date (see trend_engine.trend_summary)"""
+        return trend_summary(self.conn, iso_date(date))
+
+    def detections(self, start, end, district=None):
+        """Return detection rows as dicts for [start, end], optionally limited to one district"""
+        query = "SELECT * FROM detections WHERE date BETWEEN ? AND ?"
+        params = [iso_date(start), iso_date(end)]
+        if district is not None:
+            query = "SELECT * FROM detections WHERE district = ? AND date BETWEEN ? AND ?"
+            params.insert(0, district)
+        cursor = self.conn.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+
+CACHE_DIR = ".cache"
+SHAPEFILE_COMPONENTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def shapefile_components(shp_path):
+    """Return the component files of a shapefile that exist on disk"""
+    base = os.path.splitext(shp_path)[0]
+    return [base + ext for ext in SHAPEFILE_COMPONENTS if os.path.exists(base + ext)]
+
+
+def hash_files(paths, extra=""):
+    """Return a SHA-256 hex digest over the names and contents of the given files"""
+    digest = hashlib.sha256(extra.encode("utf-8"))
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of one file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON to a temp file beside path and rename it over path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from firms_feed import acquisition_minutes
+
+# Detections closer than this, and acquired within EVENT_WINDOW_MINUTES of each other, belong to one event
+EVENT_DISTANCE_M = 1500
+EVENT_WINDOW_MINUTES = 24 * 60
+EARTH_RADIUS_M = 6_371_000
+EVENT_COLUMNS = [
+    "Event", "District", "Detections", "Peak FRP", "Total FRP", "Centroid Lat", "Centroid Lon",
+    "Area (sq km)", "First Detected", "Last Detected", "Footprint",
+]
+
+
+def local_metres(lons, lats):
+    """Equirectangular x/y in metres about the points' mean latitude; accurate at event scale"""
+    cos_lat = np.cos(np.radians(np.mean(lats))) if len(lats) else 1.0
+    return (np.radians(lons) * EARTH_RADIUS_M * cos_lat, np.radians(lats) * EARTH_RADIUS_M)
+
+
+def neighbour_pairs(x, y, t, distance_m, window_minutes):
+    """Index pairs (i, j) of points within distance_m and window_minutes, found through a grid hash
+
+    Points are bucketed into cells of distance_m by window_minutes, so every
+    neighbour lies in the same or an adjacent cell; only those cells are
+    compared, which keeps the work linear in points plus true neighbours.
+    """
+    cx = np.floor(x / distance_m).astype(np.int64)
+    cy = np.floor(y / distance_m).astype(np.int64)
+    ct = np.floor(t / window_minutes).astype(np.int64)
+    # Shift to start at 1 so a -1 offset never wraps into another row of the encoding
+    cx, cy, ct = cx - cx.min() + 1, cy - cy.min() + 1, ct - ct.min() + 1
+    nx, ny = int(cx.max()) + 2, int(cy.max()) + 2
+    keys = (ct * ny + cy) * nx + cx
+    cells = pd.DataFrame({"key": keys, "i": np.arange(len(x))})
+
+    # Half of the 27 neighbouring cells (plus the cell itself) covers every unordered pair once
+    offsets = [(dx, dy, dt) for dt in (-1, 0, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+    offsets = offsets[len(offsets) // 2:]
+    pairs_i, pairs_j = [], []
+    for dx, dy, dt in offsets:
+        shifted = cells.assign(key=keys + (dt * ny + dy) * nx + dx)
+        merged = shifted.merge(cells, on="key", suffixes=("", "_n"))
+        i, j = merged["i"].to_numpy(), merged["i_n"].to_numpy()
+        if (dx, dy, dt) == (0, 0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        close = ((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 <= distance_m ** 2) & (np.abs(t[i] - t[j]) <= window_minutes)
+        pairs_i.append(i[close])
+        pairs_j.append(j[close])
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def connected_labels(n, pairs_i, pairs_j):
+    """Label the connected components of an undirected graph given as index pairs (0..k-1, in order of first point)
+
+    Vectorized union-find: each round hooks the larger root of every unresolved
+    edge under the smaller one, then compresses paths fully, so the number of
+    rounds grows with log n rather than with the width of a component.
+    """
+    parent = np.arange(n)
+    while len(pairs_i):
+        root_i, root_j = parent[pairs_i], parent[pairs_j]
+        unresolved = root_i != root_j
+        if not unresolved.any():
+            break
+        pairs_i, pairs_j = pairs_i[unresolved], pairs_j[unresolved]
+        root_i, root_j = root_i[unresolved], root_j[unresolved]
+        np.minimum.at(parent, np.maximum(root_i, root_j), np.minimum(root_i, root_j))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return np.unique(parent, return_inverse=True)[1]
+
+
+def cluster_events(detections, district_column, distance_m=EVENT_DISTANCE_M, window_minutes=EVENT_WINDOW_MINUTES):
+    """Merge neighbouring attributed detections into fire events; return one row per event, largest first"""
+    if detections.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    lons = detections.geometry.x.to_numpy()
+    lats = detections.geometry.y.to_numpy()
+    minutes = acquisition_minutes(detections)
+    x, y = local_metres(lons, lats)
+    labels = connected_labels(len(detections), *neighbour_pairs(x, y, minutes - minutes.min(), distance_m, window_minutes))
+    n_events = labels.max() + 1
+
+    counts = np.bincount(labels, minlength=n_events)
+    frp = detections["FRP"].to_numpy(dtype=np.float64) if "FRP" in detections.columns else np.zeros(len(labels))
+    frp = np.nan_to_num(frp)
+    peak_frp = np.zeros(n_events)
+    np.maximum.at(peak_frp, labels, frp)
+    first = np.full(n_events, np.iinfo(np.int64).max)
+    last = np.full(n_events, np.iinfo(np.int64).min)
+    np.minimum.at(first, labels, minutes)
+    np.maximum.at(last, labels, minutes)
+
+    # Footprint: convex hull of each event's detections, with its area taken in local metres
+    order = np.argsort(labels, kind="stable")
+    hulls = shapely.convex_hull(shapely.multipoints(np.column_stack([lons, lats])[order], indices=labels[order]))
+    metric_hulls = shapely.convex_hull(shapely.multipoints(np.column_stack([x, y])[order], indices=labels[order]))
+
+    # Each event takes the district holding most of its detections
+    districts = (
+        pd.DataFrame({"event": labels, "district": detections[district_column].to_numpy()})
+        .value_counts().reset_index(name="n")
+        .sort_values(["event", "n"], ascending=[True, False])
+        .drop_duplicates("event").set_index("event")["district"]
+    )
+
+    def timestamps(values):
+        return pd.to_datetime(values, unit="m").strftime("%Y-%m-%d %H:%M")
+
+    events = pd.DataFrame({
+        "District": districts.reindex(range(n_events)).to_numpy(),
+        "Detections": counts,
+        "Peak FRP": peak_frp.round(2),
+        "Total FRP": np.bincount(labels, weights=frp, minlength=n_events).round(2),
+        "Centroid Lat": (np.bincount(labels, weights=lats) / counts).round(5),
+        "Centroid Lon": (np.bincount(labels, weights=lons) / counts).round(5),
+        "Area (sq km)": (shapely.area(metric_hulls) / 1e6).round(3),
+        "First Detected": timestamps(first),
+        "Last Detected": timestamps(last),
+        "Footprint": shapely.to_wkt(hulls, rounding_precision=5),
+    })
+    events = events.sort_values(["Detections", "Peak FRP"], ascending=False, kind="stable").reset_index(drop=True)
+    events.insert(0, "Event", range(1, len(events) + 1))
+    return events
+
+
+def events_geojson(events, limit=None):
+    """GeoJSON FeatureCollection of event centroids (largest first) for the website"""
+    rows = events if limit is None else events.head(limit)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row["Centroid Lon"], row["Centroid Lat"]]},
+            "properties": {
+                "event": int(row["Event"]),
+                "district": row["District"] if pd.notna(row["District"]) else None,
+                "detections": int(row["Detections"]),
+                "peak_frp": float(row["Peak FRP"]),
+                "area_sq_km": float(row["Area (sq km)"]),
+                "first_detected": row["First Detected"],
+                "last_detected": row["Last Detected"],
+            },
+        }
+        for row in rows.to_dict("records")
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,175 @@
+import io
+
+import geopandas as gpd
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+import matplotlib.image as mpimg
+from matplotlib.offsetbox import AnnotationBbox, DrawingArea, OffsetBox, OffsetImage
+from matplotlib.legend_handler import HandlerTuple
+import matplotlib.lines as mlines
+from PIL import Image as PILImage
+import shapely
+
+from file_utils import shapefile_components
+from map_layers import (
+    add_marker_layer, composite_markers, load_base_map, project_to_pixels, scale_icon, selected_marker_renderer
+)
+
+MAP_DPI = 300
+FIRE_MARKER_ZOOM = 0.06
+# Reuse the pre-rendered districts/protected-areas/legend background from the cache directory
+USE_BASE_MAP_CACHE = True
+# Padding around the tight crop of the saved map, in inches
+MAP_PAD_INCHES = 0.12
+# The legend handler leaves the fire entry blank; the icon is stamped into the saved image instead
+LEGEND_ICON_ZOOM = 0.16
+
+def read_base_layers(districts_plot_shp, protected_areas_shp):
+    districts_gdf = gpd.read_file(districts_plot_shp)
+    protected_gdf = gpd.read_file(protected_areas_shp)
+    if protected_gdf.crs != districts_gdf.crs:
+        protected_gdf = protected_gdf.to_crs(districts_gdf.crs)
+    return districts_gdf, protected_gdf
+
+def draw_base_map(districts_gdf, protected_gdf, fire_img, north_arrow_path):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    districts_gdf.plot(ax=ax, color='#e0f2e0', edgecolor='black', linewidth=0.8, zorder=1)
+    protected_gdf.plot(ax=ax, color='#8fbc8f', edgecolor='none', zorder=2)
+
+    ax.set_xlim(districts_gdf.total_bounds[0], districts_gdf.total_bounds[2])
+    ax.set_ylim(districts_gdf.total_bounds[1], districts_gdf.total_bounds[3])
+    ax.set_axis_off()
+
+    # --- Legend: Use HandlerTuple for fire icon ---
+    fire_handle = mlines.Line2D([], [], linestyle="none")
+    fire_img_icon = OffsetImage(fire_img, zoom=0.18)  # Larger legend icon
+
+    class HandlerFireTuple(HandlerTuple):
+        def create_artists(self, legend, orig_handle, xdescent, ydescent, width, height, fontsize, trans):
+            oi = orig_handle[1]
+            ab = AnnotationBbox(oi, (width/2, height/2), frameon=False, pad=0)
+            ab.set_transform(trans)
+            return [ab]
+
+    protected_patch = mpatches.Patch(color='#8fbc8f', label='Protected Areas')
+    district_patch = mpatches.Patch(facecolor='#e0f2e0', edgecolor='black', label='District', linewidth=0.8)
+
+    fire_tuple = (fire_handle, fire_img_icon)
+    handles = [fire_tuple, protected_patch, district_patch]
+    labels = ['Fire Points', 'Protected Areas', 'District']
+    handler_map = {fire_tuple: HandlerFireTuple()}
+
+    leg = ax.legend(handles, labels, handler_map=handler_map, loc='lower left',
+                    fontsize=12, frameon=True, borderpad=0.8, labelspacing=0.7,
+                    edgecolor='#cccccc', title="Legend", title_fontsize=13)
+    leg.get_frame().set_linewidth(1)
+    leg.get_frame().set_edgecolor('#cccccc')
+    leg.get_frame().set_facecolor('white')
+
+    north_img = mpimg.imread(north_arrow_path)
+    newax = fig.add_axes([0.83, 0.80, 0.09, 0.16], anchor='NE', zorder=10)
+    newax.imshow(north_img)
+    newax.axis('off')
+    return fig, ax
+
+def layout_for_save(fig, dpi):
+    """Draw fig at dpi and return the tight crop (in inches) it will be saved with"""
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    return fig.get_tightbbox(fig.canvas.get_renderer()).padded(MAP_PAD_INCHES)
+
+def legend_handle_box(legend, handle):
+    """The DrawingArea a legend entry's handle is drawn in"""
+    boxes = list(legend.get_children())
+    while boxes:
+        box = boxes.pop()
+        if isinstance(box, DrawingArea) and handle in box.get_children():
+            return box
+        boxes.extend(child for child in box.get_children() if isinstance(child, OffsetBox))
+    return None
+
+def legend_icon_xy(ax, bbox, dpi):
+    """Pixel centre of the legend's fire entry in the image saved with bbox_inches=bbox, after layout_for_save"""
+    legend = ax.get_legend()
+    extent = legend_handle_box(legend, legend.legend_handles[0]).get_window_extent(ax.figure.canvas.get_renderer())
+    return (extent.x0 + extent.x1) / 2 - bbox.x0 * dpi, bbox.y1 * dpi - (extent.y0 + extent.y1) / 2
+
+def add_legend_icon(image, fire_img, dpi, xy):
+    icon = scale_icon(fire_img, LEGEND_ICON_ZOOM, 100 * dpi / 300)
+    return composite_markers(image, icon, [xy[0]], [xy[1]])
+
+def render_base_map(dpi, districts_plot_shp, protected_areas_shp, fire_icon_path, north_arrow_path):
+    districts_gdf, protected_gdf = read_base_layers(districts_plot_shp, protected_areas_shp)
+    fig, ax = draw_base_map(districts_gdf, protected_gdf, mpimg.imread(fire_icon_path), north_arrow_path)
+    plt.tight_layout()
+
+    # Resolve the tight crop ourselves so we know where the axes and legend land in the saved pixels
+    bbox = layout_for_save(fig, dpi)
+    axes_extent = ax.get_window_extent(fig.canvas.get_renderer())
+    icon_xy = legend_icon_xy(ax, bbox, dpi)
+    georef = {
+        "crs": districts_gdf.crs.to_wkt(),
+        "dpi": dpi,
+        "xlim": list(ax.get_xlim()),
+        "ylim": list(ax.get_ylim()),
+        "axes_px": [
+            axes_extent.x0 - bbox.x0 * dpi,
+            bbox.y1 * dpi - axes_extent.y1,
+            axes_extent.width,
+            axes_extent.height,
+        ],
+    }
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches=bbox)
+    plt.close(fig)
+    buffer.seek(0)
+    base_image = add_legend_icon(PILImage.open(buffer).convert("RGBA"), mpimg.imread(fire_icon_path), dpi, icon_xy)
+    return base_image, georef, districts_gdf.union_all()
+
+def plot_fire_map(fire_gdf, districts_plot_shp, protected_areas_shp, fire_icon_path, north_arrow_path,
+                  marker_renderer=None, use_base_map_cache=USE_BASE_MAP_CACHE):
+    """Render the fire map as a PIL image; marker_renderer defaults to the FIRE_MARKER_RENDERER choice"""
+    marker_renderer = marker_renderer or selected_marker_renderer()
+    fire_img = mpimg.imread(fire_icon_path)
+
+    if use_base_map_cache and marker_renderer != "annotation":
+        resources = (shapefile_components(districts_plot_shp) + shapefile_components(protected_areas_shp)
+                     + [fire_icon_path, north_arrow_path])
+        base_image, georef, nepal_union = load_base_map(
+            resources, MAP_DPI,
+            lambda dpi: render_base_map(dpi, districts_plot_shp, protected_areas_shp, fire_icon_path, north_arrow_path)
+        )
+        if fire_gdf.crs != georef["crs"]:
+            fire_gdf = fire_gdf.to_crs(georef["crs"])
+        xs, ys = fire_gdf.geometry.x.to_numpy(), fire_gdf.geometry.y.to_numpy()
+        inside = shapely.contains_xy(nepal_union, xs, ys)
+        cols, rows = project_to_pixels(georef, xs[inside], ys[inside])
+        map_image = composite_markers(base_image, scale_icon(fire_img, FIRE_MARKER_ZOOM, MAP_DPI), cols, rows)
+        return map_image.convert("RGB")
+
+    districts_gdf, protected_gdf = read_base_layers(districts_plot_shp, protected_areas_shp)
+    if fire_gdf.crs != districts_gdf.crs:
+        fire_gdf = fire_gdf.to_crs(districts_gdf.crs)
+
+    nepal_union = districts_gdf.union_all()
+    fire_gdf = fire_gdf[fire_gdf.geometry.within(nepal_union)]
+
+    fig, ax = draw_base_map(districts_gdf, protected_gdf, fire_img, north_arrow_path)
+    if marker_renderer == "annotation":
+        for x, y in zip(fire_gdf.geometry.x, fire_gdf.geometry.y):
+            ab = AnnotationBbox(OffsetImage(fire_img, zoom=FIRE_MARKER_ZOOM), (x, y), frameon=False, zorder=3)
+            ax.add_artist(ab)
+
+    plt.tight_layout()
+    if marker_renderer != "annotation":
+        # Stamped after layout so the layer matches the final axes size in output pixels
+        add_marker_layer(ax, fire_gdf.geometry.x, fire_gdf.geometry.y, fire_img, zoom=FIRE_MARKER_ZOOM, dpi=MAP_DPI)
+    bbox = layout_for_save(fig, MAP_DPI)
+    icon_xy = legend_icon_xy(ax, bbox, MAP_DPI)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=MAP_DPI, bbox_inches=bbox)
+    plt.close(fig)
+    buffer.seek(0)
+    map_image = add_legend_icon(PILImage.open(buffer).convert("RGBA"), fire_img, MAP_DPI, icon_xy)
+    return map_image.convert("RGB")
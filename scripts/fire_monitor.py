@@ -1,32 +1,45 @@
-import requests
-import zipfile
-import geopandas as gpd
+import time
+
+# Measured before the heavy imports so --stats-only can report its startup cost
+_STARTUP_BEGAN = time.perf_counter()
+
 import pandas as pd
 import os
-import shutil
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import matplotlib.image as mpimg
-from matplotlib.offsetbox import OffsetImage, AnnotationBbox
-from matplotlib.legend_handler import HandlerTuple
-import matplotlib.lines as mlines
-import nepali_datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle, PageBreak, Flowable
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from PIL import Image as PILImage
+import argparse
+import io
 import sys
 import subprocess
 import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from artifact_cache import artifact_key, frame_digest, prune_artifact_cache, restore_artifact, store_artifact
+from daily_summary import build_summary, summary_path
+from detection_stats import confidence_summary, detection_statistics
+from detection_store import DetectionStore
+from fire_events import cluster_events, events_geojson
+from file_utils import CACHE_DIR, shapefile_components
+from firms_feed import (
+    FIRMS_FEEDS, SENSOR_LABELS, combine_detections, download_feeds, feed_already_processed, mark_feed_processed,
+    parse_sensors, read_feeds, satellite_label
+)
+import run_report
+from run_report import RunReport, measured_call, peak_rss_mb
+from spatial_index import load_attribution_index
+from web_layers import boundary_layer, fire_layer_path, fire_point_layer
+
+# Rendering libraries (matplotlib, reportlab, PIL, nepali_datetime) are only imported by
+# fire_map / fire_report and inside run() once a map or PDF is actually needed.
+STARTUP_SECONDS = time.perf_counter() - _STARTUP_BEGAN
 
 
 # === File paths ===
 RESOURCES_DIR = "resources"
-FIRMS_URL = "https://firms.modaps.eosdis.nasa.gov/data/active_fire/modis-c6.1/shapes/zips/MODIS_C6_1_South_Asia_24h.zip"
+# Sensors to ingest (FIRMS_SENSORS=MODIS,VIIRS_SNPP,...; unset or empty means all) and their URLs,
+# overridable with FIRMS_URL_<SENSOR> so the downloader can be pointed at a local HTTP stand-in
+FIRMS_SENSORS = parse_sensors(os.environ.get("FIRMS_SENSORS") or ",".join(FIRMS_FEEDS))
+FIRMS_URLS = {sensor: os.environ.get(f"FIRMS_URL_{sensor}", FIRMS_FEEDS[sensor]) for sensor in FIRMS_SENSORS}
 
 NEPAL_DISTRICTS_SHP = os.path.join(RESOURCES_DIR, "nepal_districts_wards.shp")
 DISTRICT_PLOT_SHP = os.path.join(RESOURCES_DIR, "nepal_districts_plot.shp")
@@ -34,215 +47,21 @@ PROTECTED_AREAS_SHP = os.path.join(RESOURCES_DIR, "nepal_protected_areas.shp")
 FIRE_ICON_PATH = os.path.join(RESOURCES_DIR, "fire_icon.png")
 NORTH_ARROW_PATH = os.path.join(RESOURCES_DIR, "north_arrow.png")
 
-DOWNLOAD_DIR = "temp_fire_data"
+# Kept between runs so conditional and resumed downloads have something to compare against
+DOWNLOAD_DIR = os.path.join(CACHE_DIR, "firms")
 OUTPUT_FOLDER = "fire_reports"
-today_str = datetime.now().strftime('%Y%m%d')
-OUTPUT_EXCEL = os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_report_{today_str}.xlsx")
-OUTPUT_IMG_PATH = os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_map_{today_str}.jpg")
-OUTPUT_PDF_PATH = os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_report_{today_str}.pdf")
-CONFIDENCE_DATA_PATH = os.path.join(OUTPUT_FOLDER, f"fire_confidence_{today_str}.json")
+REPORTS_FOLDER = "reports"
 DISTRICT_COLUMN_NAME = "DISTRICT"
-
-class Divider(Flowable):
-    def __init__(self, width=480, thickness=0.8, color=colors.grey, space_before=10, space_after=10):
-        Flowable.__init__(self)
-        self.width = width
-        self.thickness = thickness
-        self.color = color
-        self.space_before = space_before
-        self.space_after = space_after
-
-    def wrap(self, availWidth, availHeight):
-        return (self.width, self.thickness + self.space_before + self.space_after)
-
-    def draw(self):
-        self.canv.saveState()
-        self.canv.setStrokeColor(self.color)
-        self.canv.setLineWidth(self.thickness)
-        y = self.space_before + self.thickness / 2
-        self.canv.line(0, y, self.width, y)
-        self.canv.restoreState()
-
-def download_file(url, target_dir):
-    os.makedirs(target_dir, exist_ok=True)
-    local_filename = os.path.join(target_dir, url.split('/')[-1])
-    try:
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_filename, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        return local_filename
-    except requests.exceptions.RequestException as e:
-        print(f"Download error: {e}")
-        return None
-
-def unzip_file(zip_filepath, extract_dir):
-    try:
-        with zipfile.ZipFile(zip_filepath, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        shp_files = [f for f in os.listdir(extract_dir) if f.lower().endswith('.shp')]
-        if not shp_files:
-            return None
-        return os.path.join(extract_dir, shp_files[0])
-    except Exception as e:
-        print(f"Unzip error: {e}")
-        return None
-
-def plot_fire_map(fire_gdf, districts_plot_shp, protected_areas_shp, fire_icon_path, north_arrow_path, output_img_path):
-    districts_gdf = gpd.read_file(districts_plot_shp)
-    protected_gdf = gpd.read_file(protected_areas_shp)
-
-    if fire_gdf.crs != districts_gdf.crs:
-        fire_gdf = fire_gdf.to_crs(districts_gdf.crs)
-    if protected_gdf.crs != districts_gdf.crs:
-        protected_gdf = protected_gdf.to_crs(districts_gdf.crs)
-
-    nepal_union = districts_gdf.unary_union
-    fire_gdf = fire_gdf[fire_gdf.geometry.within(nepal_union)]
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    districts_gdf.plot(ax=ax, color='#e0f2e0', edgecolor='black', linewidth=0.8, zorder=1)
-    protected_gdf.plot(ax=ax, color='#8fbc8f', edgecolor='none', zorder=2)
-
-    fire_img = mpimg.imread(fire_icon_path)
-    for x, y in zip(fire_gdf.geometry.x, fire_gdf.geometry.y):
-        ab = AnnotationBbox(OffsetImage(fire_img, zoom=0.06), (x, y), frameon=False, zorder=3)
-        ax.add_artist(ab)
-
-    ax.set_xlim(districts_gdf.total_bounds[0], districts_gdf.total_bounds[2])
-    ax.set_ylim(districts_gdf.total_bounds[1], districts_gdf.total_bounds[3])
-    ax.set_axis_off()
-
-    # --- Legend: Use HandlerTuple for fire icon ---
-    fire_handle = mlines.Line2D([], [], linestyle="none")
-    fire_img_icon = OffsetImage(fire_img, zoom=0.18)  # Larger legend icon
-
-    class HandlerFireTuple(HandlerTuple):
-        def create_artists(self, legend, orig_handle, xdescent, ydescent, width, height, fontsize, trans):
-            oi = orig_handle[1]
-            ab = AnnotationBbox(oi, (width/2, height/2), frameon=False, pad=0)
-            ab.set_transform(trans)
-            return [ab]
-
-    protected_patch = mpatches.Patch(color='#8fbc8f', label='Protected Areas')
-    district_patch = mpatches.Patch(facecolor='#e0f2e0', edgecolor='black', label='District', linewidth=0.8)
-
-    fire_tuple = (fire_handle, fire_img_icon)
-    handles = [fire_tuple, protected_patch, district_patch]
-    labels = ['Fire Points', 'Protected Areas', 'District']
-    handler_map = {fire_tuple: HandlerFireTuple()}
-
-    leg = ax.legend(handles, labels, handler_map=handler_map, loc='lower left',
-                    fontsize=12, frameon=True, borderpad=0.8, labelspacing=0.7,
-                    edgecolor='#cccccc', title="Legend", title_fontsize=13)
-    leg.get_frame().set_linewidth(1)
-    leg.get_frame().set_edgecolor('#cccccc')
-    leg.get_frame().set_facecolor('white')
-
-    north_img = mpimg.imread(north_arrow_path)
-    newax = fig.add_axes([0.83, 0.80, 0.09, 0.16], anchor='NE', zorder=10)
-    newax.imshow(north_img)
-    newax.axis('off')
-
-    plt.tight_layout()
-    plt.savefig(output_img_path, dpi=300, bbox_inches='tight', pad_inches=0.12)
-    plt.close()
-
-def overlay_icon_on_map(map_image_path, fire_icon_path, output_image_path, icon_x=140, icon_y=1458, zoom=0.16):
-    map_img = mpimg.imread(map_image_path)
-    img_height, img_width = map_img.shape[0], map_img.shape[1]
-    fire_icon_img = mpimg.imread(fire_icon_path)
-
-    fig, ax = plt.subplots(figsize=(img_width/100, img_height/100), dpi=100)
-    ax.imshow(map_img)
-    ab = AnnotationBbox(
-        OffsetImage(fire_icon_img, zoom=zoom),
-        (icon_x, icon_y),
-        frameon=False,
-        xycoords='data'
-    )
-    ax.add_artist(ab)
-    ax.axis('off')
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-    plt.savefig(output_image_path, dpi=100, bbox_inches='tight', pad_inches=0)
-    plt.close()
-    print(f"Fire icon added at ({icon_x}, {icon_y}) and saved to: {output_image_path}")
-
-def generate_fire_report_pdf(
-    pdf_path,
-    fire_count,
-    english_date,
-    nepali_date,
-    assessed_time,
-    fire_map_path,
-    fire_counts_df
-):
-    styles = getSampleStyleSheet()
-    styleN = styles['Normal']
-    styleH = styles['Heading1']
-
-    desc_style = ParagraphStyle(
-        'desc',
-        parent=styleN,
-        fontSize=12,
-        leading=16,
-        spaceAfter=16
-    )
-
-    desc = (
-        f"<b>{fire_count}</b> fires have been detected in Nepal as of "
-        f"<b>{english_date} ({nepali_date})</b> in the past 24 hours.<br/>"
-        "(Note: For landscape level data, please contact us.)<br/><br/>"
-        "<b>Satellite:</b> MODIS 1km<br/>"
-        f"<b>Assessed Time:</b> {assessed_time}<br/><br/>"
-        "(Source: https://firms.modaps.eosdis.nasa.gov/active_fire/ )"
-    )
-
-    elements = []
-    elements.append(Paragraph("Nepal Daily Fire Report", styleH))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(desc, desc_style))
-    elements.append(Spacer(1, 8))
-    elements.append(Divider(width=480))
-    elements.append(Spacer(1, 8))
-
-    # --- Fit map image to page width with margin, keep aspect ratio ---
-    pil_img = PILImage.open(fire_map_path)
-    img_width, img_height = pil_img.size
-    max_width = 480  # points (A4 width is 595 points, so this is a good margin)
-    aspect = img_height / img_width
-    display_width = max_width
-    display_height = display_width * aspect
-    elements.append(RLImage(fire_map_path, width=display_width, height=display_height))
-    elements.append(Spacer(1, 8))
-    elements.append(Divider(width=480, color=colors.lightgrey))
-    elements.append(PageBreak())
-
-    # --- Table on second page ---
-    elements.append(Paragraph("Fire Counts by District", styleH))
-    elements.append(Spacer(1, 8))
-    elements.append(Divider(width=480, color=colors.lightgrey))
-    elements.append(Spacer(1, 8))
-
-    table_data = [fire_counts_df.columns.tolist()] + fire_counts_df.fillna("").astype(str).values.tolist()
-    table = Table(table_data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#e0f2e0")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor("#000000")),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
-    elements.append(table)
-
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-    doc.build(elements)
-    print(f"PDF saved: {pdf_path}")
+LOCAL_UNIT_COLUMN_NAME = "GaPa_NaPa"
+PROTECTED_AREA_COLUMN_NAME = "PROTECTED_AREA"
+# Layers attributed in one spatial query; the first (wards, which carry the district) decides what is in Nepal
+ATTRIBUTION_LAYERS = {"wards": NEPAL_DISTRICTS_SHP, "protected_areas": PROTECTED_AREAS_SHP}
+ATTRIBUTION_COLUMNS = {
+    "wards": {DISTRICT_COLUMN_NAME: DISTRICT_COLUMN_NAME, LOCAL_UNIT_COLUMN_NAME: LOCAL_UNIT_COLUMN_NAME},
+    "protected_areas": {"PAS_NAME": PROTECTED_AREA_COLUMN_NAME},
+}
+# Processes used to write the Excel, map and confidence artifacts side by side
+ARTIFACT_WORKERS = 3
 
 def open_pdf(path):
     if sys.platform.startswith('darwin'):
@@ -252,170 +71,512 @@ def open_pdf(path):
     elif os.name == 'posix':
         subprocess.call(('xdg-open', path))
 
-def main():
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-
-    zip_path = download_file(FIRMS_URL, DOWNLOAD_DIR)
-    if not zip_path:
-        return
-
-    fire_shp_path = unzip_file(zip_path, DOWNLOAD_DIR)
-    if not fire_shp_path:
-        shutil.rmtree(DOWNLOAD_DIR)
-        return
-
-    try:
-        fire_gdf = gpd.read_file(fire_shp_path)
-        nepal_districts_gdf = gpd.read_file(NEPAL_DISTRICTS_SHP)
-    except Exception as e:
-        print(f"Shapefile read error: {e}")
-        shutil.rmtree(DOWNLOAD_DIR)
-        return
-
-    # Extract confidence values here (before any filtering)
-    confidence_data = {}
-    if 'CONFIDENCE' in fire_gdf.columns:
-        confidence_values = fire_gdf['CONFIDENCE'].astype(float)
-        confidence_data = {
-            "average": round(confidence_values.mean()),
-            "median": round(confidence_values.median()),
-            "high_confidence_pct": round((confidence_values >= 80).sum() / len(confidence_values) * 100),
-            "confidence_distribution": {
-                "low": int((confidence_values < 30).sum()),
-                "medium": int((confidence_values.between(30, 79)).sum()),
-                "high": int((confidence_values >= 80).sum())
-            }
-        }
-    else:
-        # If CONFIDENCE column doesn't exist, look for other confidence-related columns
-        confidence_cols = [col for col in fire_gdf.columns if 'CONF' in col.upper()]
-        if confidence_cols:
-            confidence_values = fire_gdf[confidence_cols[0]].astype(float)
-            confidence_data = {
-                "average": round(confidence_values.mean()),
-                "median": round(confidence_values.median()),
-                "high_confidence_pct": round((confidence_values >= 80).sum() / len(confidence_values) * 100),
-                "confidence_distribution": {
-                    "low": int((confidence_values < 30).sum()),
-                    "medium": int((confidence_values.between(30, 79)).sum()),
-                    "high": int((confidence_values >= 80).sum())
-                }
-            }
-        else:
-            # Fallback to default values if no confidence column found
-            confidence_data = {
-                "average": 80,
-                "median": 85,
-                "high_confidence_pct": 70,
-                "confidence_distribution": {
-                    "low": 10,
-                    "medium": 20,
-                    "high": 70
-                }
-            }
-
-    # Save confidence data to file
+def report_paths(date_str):
+    """Output paths of every report artifact for a YYYYMMDD date"""
+    iso_date = datetime.strptime(date_str, '%Y%m%d').strftime('%Y-%m-%d')
+    return {
+        "excel": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_report_{date_str}.xlsx"),
+        "map": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_map_{date_str}.jpg"),
+        "map_web": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_map_{date_str}_web.jpg"),
+        "map_webp": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_map_{date_str}_web.webp"),
+        "map_thumbnail": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_map_{date_str}_thumb.jpg"),
+        # Only an input of the PDF, so it is kept with the cached artifacts rather than published
+        "map_pdf": os.path.join(CACHE_DIR, "maps", f"nepal_daily_fire_map_{date_str}_pdf.jpg"),
+        "pdf": os.path.join(OUTPUT_FOLDER, f"nepal_daily_fire_report_{date_str}.pdf"),
+        "confidence": os.path.join(OUTPUT_FOLDER, f"fire_confidence_{date_str}.json"),
+        "summary": summary_path(date_str),
+        "stats": os.path.join(OUTPUT_FOLDER, f"fire_stats_{date_str}.json"),
+        "events": os.path.join(REPORTS_FOLDER, iso_date, "events.xlsx"),
+        "events_geojson": os.path.join(REPORTS_FOLDER, iso_date, "events.geojson"),
+        "layer": fire_layer_path(iso_date),
+        "run_report": os.path.join(OUTPUT_FOLDER, f"run_report_{date_str}.json"),
+        # Runs that found nothing new, kept apart so they do not replace the day's full report
+        "run_report_skipped": os.path.join(OUTPUT_FOLDER, f"run_report_{date_str}_skipped.json"),
+    }
+
+def report_outputs(paths, stats_only=False):
+    names = ("summary", "confidence", "stats") if stats_only else ("summary", "excel", "map", "map_web", "map_webp", "map_thumbnail", "pdf", "confidence", "stats", "events", "events_geojson", "layer")
+    return {name: paths[name] for name in names}
+
+ARTIFACT_SAVED = {
+    "stats": "Detection statistics saved: {}",
+    "confidence": "Confidence data saved: {}",
+    "summary": "Daily summary saved: {}",
+    "excel": "Excel saved: {}",
+    "map": "Map saved: {} (with web and thumbnail variants)",
+    "events": "Fire events saved: {}",
+    "layer": "Web map layer saved: {}",
+}
+ARTIFACT_ERRORS = {
+    "stats": "Error saving detection statistics: {}",
+    "confidence": "Error saving confidence data: {}",
+    "summary": "Error saving daily summary: {}",
+    "excel": "Excel export error: {}",
+    "map": "Map export error: {}",
+    "pdf": "PDF export error: {}",
+    "events": "Fire events export error: {}",
+    "layer": "Web map layer export error: {}",
+}
+
+def column_values(gdf, column, dtype):
+    return gdf[column].astype(dtype).tolist() if column in gdf.columns else None
+
+def detection_columns(fires_in_nepal):
+    """Plain per-column lists of the attributed detections, in DetectionStore.write_day's keyword names"""
+    # Same rows as the district counts, which leave out points with no district attribute
+    fires_in_nepal = fires_in_nepal[fires_in_nepal[DISTRICT_COLUMN_NAME].notna()]
+    if fires_in_nepal.crs is not None and not fires_in_nepal.crs.is_geographic:
+        fires_in_nepal = fires_in_nepal.to_crs("EPSG:4326")
+    return {
+        "districts": fires_in_nepal[DISTRICT_COLUMN_NAME].tolist(),
+        "longitudes": fires_in_nepal.geometry.x.tolist(),
+        "latitudes": fires_in_nepal.geometry.y.tolist(),
+        "confidence": column_values(fires_in_nepal, 'CONFIDENCE', float),
+        "frp": column_values(fires_in_nepal, 'FRP', float),
+        "acq_date": column_values(fires_in_nepal, 'ACQ_DATE', str),
+        "acq_time": column_values(fires_in_nepal, 'ACQ_TIME', str),
+        "sensor": column_values(fires_in_nepal, 'SENSOR', str),
+    }
+
+def record_detections(date_str, columns):
+    with DetectionStore() as store:
+        store.write_day(date_str, **columns)
+
+def export_stats(stats, path):
+    with open(path, 'w') as f:
+        json.dump(stats, f, separators=(',', ':'))
+    return path
+
+def export_confidence(confidence_data, path):
+    with open(path, 'w') as f:
+        json.dump(confidence_data, f, indent=2)
+    return path
+
+def export_summary(summary, path):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+def protected_area_table(stats):
+    """The report's protected area table, largest first"""
+    areas = stats.get("protected_areas", {})
+    return pd.DataFrame({
+        "S.N.": range(1, len(areas) + 1),
+        "Protected Area": list(areas),
+        "Fire Count": list(areas.values()),
+    })
+
+def export_excel(fire_counts_df, path, protected_areas_df=None):
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        fire_counts_df.to_excel(writer, index=False, sheet_name="Districts")
+        if protected_areas_df is not None:
+            protected_areas_df.to_excel(writer, index=False, sheet_name="Protected Areas")
+    return path
+
+def export_events(events, path, geojson_path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    events.to_excel(path, index=False, engine='openpyxl')
+    with open(geojson_path, 'w') as f:
+        json.dump(events_geojson(events), f)
+    return path
+
+def export_web_layers(detections, path):
+    boundary_layer(DISTRICT_PLOT_SHP, PROTECTED_AREAS_SHP)
+    return fire_point_layer(detections, path)
+
+# Map variants written by export_map, by encode_map_variants name
+MAP_VARIANTS = {
+    "print": "map", "web": "map_web", "webp": "map_webp", "thumbnail": "map_thumbnail", "pdf": "map_pdf",
+}
+
+def export_map(fire_gdf, paths):
+    from fire_map import MAP_DPI, plot_fire_map
+    from map_layers import encode_map_variants
+
+    map_image = plot_fire_map(
+        fire_gdf,
+        DISTRICT_PLOT_SHP,
+        PROTECTED_AREAS_SHP,
+        FIRE_ICON_PATH,
+        NORTH_ARROW_PATH
+    )
+    # Rasterized once; the PDF embeds its own variant, resampled from the in-memory master at the printed size
+    variants, pdf_size = encode_map_variants(map_image, MAP_DPI)
+    for variant, name in MAP_VARIANTS.items():
+        os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+        with open(paths[name], 'wb') as f:
+            f.write(variants[variant])
+    return paths["map"], variants["pdf"], pdf_size
+
+def export_pdf(path, total_fire_count, fire_counts_df, map_bytes, map_size, report_date, satellite):
+    if not map_bytes:
+        raise ValueError("map image unavailable")
+
+    from fire_report import generate_fire_report_pdf, report_dates
+
+    english_date_str, nepali_date_str = report_dates(report_date)
+    assessed_time_str = datetime.now().strftime("%I:%M %p")
+
+    generate_fire_report_pdf(
+        pdf_path=path,
+        fire_count=total_fire_count,
+        english_date=english_date_str,
+        nepali_date=nepali_date_str,
+        assessed_time=assessed_time_str,
+        fire_map=io.BytesIO(map_bytes),
+        fire_map_size=map_size,
+        fire_counts_df=fire_counts_df,
+        satellite=satellite
+    )
+    return path
+
+# Report files written by each cached artifact
+ARTIFACT_FILES = {"excel": ["excel"], "events": ["events", "events_geojson"], "map": list(MAP_VARIANTS.values()), "pdf": ["pdf"]}
+ARTIFACT_REUSED = "Inputs unchanged, reused: {}"
+
+def artifact_keys(fire_gdf, fire_counts_df, protected_areas_df, events, total_fire_count, report_date, satellite):
+    """Input keys of the cached artifacts, each covering its data, resource files and the code that renders it"""
+    from map_layers import selected_marker_renderer
+
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    map_resources = (shapefile_components(DISTRICT_PLOT_SHP) + shapefile_components(PROTECTED_AREAS_SHP)
+                     + [FIRE_ICON_PATH, NORTH_ARROW_PATH]
+                     + [os.path.join(scripts_dir, name) for name in ("fire_map.py", "map_layers.py")])
+    map_key = artifact_key(
+        "map", frame_digest(fire_gdf[[fire_gdf.geometry.name]]), fire_gdf.crs, selected_marker_renderer(),
+        files=map_resources
+    )
+    counts_digest = frame_digest(fire_counts_df)
+    return {
+        "excel": artifact_key("excel", counts_digest, frame_digest(protected_areas_df), files=[__file__]),
+        "events": artifact_key("events", frame_digest(events), files=[__file__]),
+        "map": map_key,
+        "pdf": artifact_key(
+            "pdf", counts_digest, total_fire_count, map_key, report_date, satellite,
+            files=[os.path.join(scripts_dir, "fire_report.py")]
+        ),
+    }
+
+def generate_artifacts(fire_gdf, detections, fire_counts_df, total_fire_count, confidence_data, stats, events, paths,
+                       report_date, satellite, workers=ARTIFACT_WORKERS, show_pdf=True, report=None, prune=True):
+    """Write the statistics and confidence JSON, Excel workbooks, web layer and map concurrently, starting the PDF as soon as the map is ready
+
+    fire_gdf holds every detection drawn on the map; detections are the attributed ones inside Nepal.
+
+    Each artifact reports its own success or failure; one failing does not stop the others.
+    The Excel workbooks, map variants and PDF are reused from the artifact cache
+    when their inputs are unchanged, leaving identical files untouched.
+    With a RunReport, each artifact is measured in the process that writes it and recorded as export_<name>.
+    prune=False leaves pruning the artifact cache to the caller, e.g. once after a pool of days.
+    """
+    rows_in = {
+        "stats": len(detections), "confidence": len(detections), "excel": len(fire_counts_df), "events": len(events),
+        "layer": len(detections), "map": len(fire_gdf), "pdf": len(fire_counts_df),
+    }
+    protected_areas_df = protected_area_table(stats)
     try:
-        with open(CONFIDENCE_DATA_PATH, 'w') as f:
-            json.dump(confidence_data, f, indent=2)
-        print(f"Confidence data saved: {CONFIDENCE_DATA_PATH}")
+        keys = artifact_keys(
+            fire_gdf, fire_counts_df, protected_areas_df, events, total_fire_count, report_date, satellite
+        )
     except Exception as e:
-        print(f"Error saving confidence data: {e}")
+        print(f"Artifact cache disabled for this run: {e}")
+        keys = {}
 
-    if fire_gdf.crs != nepal_districts_gdf.crs:
+    def reuse(name):
+        if name not in keys:
+            return False
         try:
-            fire_gdf = fire_gdf.to_crs(nepal_districts_gdf.crs)
+            hit = restore_artifact(keys[name], {role: paths[role] for role in ARTIFACT_FILES[name]})
+        except OSError as e:
+            print(f"Artifact cache read warning: {e}")
+            return False
+        if hit:
+            print(ARTIFACT_REUSED.format(paths[ARTIFACT_FILES[name][0]]))
+            if report:
+                report.add(f"export_{name}", {"cached": True}, rows_in=rows_in[name])
+        return hit
+
+    def cache(name):
+        if name in keys:
+            try:
+                store_artifact(keys[name], {role: paths[role] for role in ARTIFACT_FILES[name]})
+            except OSError as e:
+                print(f"Artifact cache write warning: {e}")
+
+    def show(path):
+        if show_pdf:
+            try:
+                open_pdf(path)
+            except Exception as e:
+                print(ARTIFACT_ERRORS["pdf"].format(e))
+
+    # A single thread keeps everything in-process, e.g. when already running inside a pool worker
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    with executor:
+        futures = {}
+
+        def submit(name, function, *args):
+            profile_path = report.profile_path(f"export_{name}") if report else None
+            future = executor.submit(measured_call, function, args, profile_path)
+            futures[future] = name
+            return future
+
+        def submit_pdf(map_bytes, map_size):
+            return submit(
+                "pdf", export_pdf, paths["pdf"], total_fire_count, fire_counts_df, map_bytes, map_size, report_date,
+                satellite
+            )
+
+        submit("stats", export_stats, stats, paths["stats"])
+        submit("confidence", export_confidence, confidence_data, paths["confidence"])
+        if not reuse("excel"):
+            submit("excel", export_excel, fire_counts_df, paths["excel"], protected_areas_df)
+        if not reuse("events"):
+            submit("events", export_events, events, paths["events"], paths["events_geojson"])
+        submit("layer", export_web_layers, detections, paths["layer"])
+        pdf_cached = reuse("pdf")
+        if pdf_cached:
+            show(paths["pdf"])
+        if not reuse("map"):
+            submit("map", export_map, fire_gdf, paths)
+        elif not pdf_cached:
+            with open(paths["map_pdf"], "rb") as f:
+                submit_pdf(f.read(), None)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    value, metrics = future.result()
+                    error = None
+                except Exception as e:
+                    print(ARTIFACT_ERRORS[name].format(e))
+                    value, metrics, error = None, None, e
+                if report:
+                    report.add(f"export_{name}", metrics, rows_in=rows_in[name], error=error)
+                if value:
+                    cache(name)
+
+                if name == "map":
+                    path, map_bytes, map_size = value if value else (None, None, None)
+                    if path:
+                        print(ARTIFACT_SAVED[name].format(path))
+                    if not pdf_cached:
+                        pending.add(submit_pdf(map_bytes, map_size))
+                elif name == "pdf":
+                    # generate_fire_report_pdf reports the saved path itself
+                    if value:
+                        show(value)
+                elif value:
+                    print(ARTIFACT_SAVED[name].format(value))
+
+    if prune:
+        try:
+            prune_artifact_cache()
+        except OSError as e:
+            print(f"Artifact cache prune warning: {e}")
+
+def fire_counts_table(stats):
+    """Return the report's district table (largest first, with a "Total" row) and the total fire count"""
+    if not stats["districts"]:
+        return pd.DataFrame(columns=["S.N.", "District", "Fire Count"]), 0
+
+    fire_counts = pd.Series(
+        {district: district_stats["count"] for district, district_stats in stats["districts"].items()}
+    ).rename_axis(DISTRICT_COLUMN_NAME)
+    fire_counts_df = fire_counts.reset_index(name='Fire Count')
+    fire_counts_df = fire_counts_df.sort_values(by="Fire Count", ascending=False)
+    fire_counts_df.insert(0, 'S.N.', range(1, 1 + len(fire_counts_df)))
+    fire_counts_df = fire_counts_df.rename(columns={DISTRICT_COLUMN_NAME: "District"})
+
+    total = pd.DataFrame([{"S.N.": "", "District": "Total", "Fire Count": fire_counts_df["Fire Count"].sum()}])
+    fire_counts_df = pd.concat([fire_counts_df, total], ignore_index=True)
+    total_fire_count = fire_counts_df.loc[fire_counts_df["District"] == "Total", "Fire Count"].values[0]
+    return fire_counts_df, total_fire_count
+
+def export_summaries(result, paths, report=None, names=("stats", "confidence", "summary")):
+    """Write the small statistics, confidence and daily summary JSON files for a processed day"""
+    exports = {
+        "stats": (export_stats, (result["stats"], paths["stats"])),
+        "confidence": (export_confidence, (result["confidence"], paths["confidence"])),
+        "summary": (export_summary, (result["summary"], paths["summary"])),
+    }
+    for name in names:
+        export, args = exports[name]
+        with (report.stage(f"export_{name}") if report else nullcontext()) as stage:
+            try:
+                print(ARTIFACT_SAVED[name].format(export(*args)))
+            except Exception as e:
+                print(ARTIFACT_ERRORS[name].format(e))
+                if stage:
+                    stage.fail(e)
+
+def process_detections(fire_gdf, date_str, stats_only=False, workers=ARTIFACT_WORKERS, record=True, show_pdf=True,
+                       satellite=SENSOR_LABELS["MODIS"], report=None, prune=True):
+    """Attribute one day's detections to districts, local units and protected areas and write that day's reports
+
+    Returns the in-memory results, or None if processing stopped early. With
+    record=False nothing is written to the detection store; the attributed rows
+    are returned under "detections" for the caller to record instead. Stages are
+    timed into report, or into the day's own run report when none is given.
+    """
+    paths = report_paths(date_str)
+    if report is None:
+        with RunReport(date_str, paths["run_report"]) as report:
+            return process_detections(
+                fire_gdf, date_str, stats_only=stats_only, workers=workers, record=record, show_pdf=show_pdf,
+                satellite=satellite, report=report, prune=prune
+            )
+
+    outputs = report_outputs(paths, stats_only)
+    with report.stage("attribution", rows_in=len(fire_gdf)) as stage:
+        try:
+            attribution_index = load_attribution_index(ATTRIBUTION_LAYERS)
         except Exception as e:
-            print(f"CRS conversion error: {e}")
-            shutil.rmtree(DOWNLOAD_DIR)
-            return
+            print(f"Shapefile read error: {e}")
+            return stage.fail(e)
+
+        if fire_gdf.crs != attribution_index.crs:
+            try:
+                fire_gdf = fire_gdf.to_crs(attribution_index.crs)
+            except Exception as e:
+                print(f"CRS conversion error: {e}")
+                return stage.fail(e)
+
+        for layer, columns in ATTRIBUTION_COLUMNS.items():
+            missing = set(columns) - set(attribution_index.layers[layer].attributes.columns)
+            if missing:
+                print(f"Missing {layer} column: {', '.join(sorted(missing))}")
+                return stage.fail(f"missing {layer} columns {sorted(missing)}")
 
-    try:
-        fires_in_nepal = gpd.sjoin(fire_gdf, nepal_districts_gdf, how='inner', predicate='within')
-    except Exception as e:
-        print(f"Spatial join error: {e}")
-        shutil.rmtree(DOWNLOAD_DIR)
-        return
-
-    if DISTRICT_COLUMN_NAME not in fires_in_nepal.columns:
-        print(f"Missing district column: {DISTRICT_COLUMN_NAME}")
-        shutil.rmtree(DOWNLOAD_DIR)
-        return
-
-    if fires_in_nepal.empty:
-        fire_counts_df = pd.DataFrame(columns=["S.N.", "District", "Fire Count"])
-        total_fire_count = 0
+        try:
+            fires_in_nepal = attribution_index.join(fire_gdf, ATTRIBUTION_COLUMNS)
+        except Exception as e:
+            print(f"Spatial join error: {e}")
+            return stage.fail(e)
+        stage.rows_out = len(fires_in_nepal)
+
+    with report.stage("statistics", rows_in=len(fires_in_nepal)) as stage:
+        # One grouped pass over the attributed detections; counts and confidence are read from it
+        stats = detection_statistics(
+            fires_in_nepal, DISTRICT_COLUMN_NAME, LOCAL_UNIT_COLUMN_NAME, PROTECTED_AREA_COLUMN_NAME
+        )
+        confidence_data = confidence_summary(stats)
+        fire_counts_df, total_fire_count = fire_counts_table(stats)
+        stage.rows_out = len(stats["districts"])
+
+    with report.stage("events", rows_in=len(fires_in_nepal)) as stage:
+        events = cluster_events(fires_in_nepal, DISTRICT_COLUMN_NAME)
+        stage.rows_out = len(events)
+
+    result = {
+        "date": date_str,
+        "skipped": False,
+        "fire_counts": fire_counts_df,
+        "total_fires": int(total_fire_count),
+        "confidence": confidence_data,
+        "stats": stats,
+        "events": events,
+        "satellite": satellite,
+        "summary": build_summary(date_str, stats, confidence_data, events, satellite),
+        "outputs": outputs,
+    }
+
+    columns = detection_columns(fires_in_nepal)
+    if record:
+        with report.stage("record", rows_in=len(fires_in_nepal)) as stage:
+            try:
+                record_detections(date_str, columns)
+            except Exception as e:
+                print(f"Detection store error: {e}")
+                stage.fail(e)
     else:
-        fire_counts = fires_in_nepal.groupby(DISTRICT_COLUMN_NAME).size()
-        fire_counts_df = fire_counts.reset_index(name='Fire Count')
-        fire_counts_df = fire_counts_df.sort_values(by="Fire Count", ascending=False)
-        fire_counts_df.insert(0, 'S.N.', range(1, 1 + len(fire_counts_df)))
-        fire_counts_df = fire_counts_df.rename(columns={DISTRICT_COLUMN_NAME: "District"})
-
-        total = pd.DataFrame([{"S.N.": "", "District": "Total", "Fire Count": fire_counts_df["Fire Count"].sum()}])
-        fire_counts_df = pd.concat([fire_counts_df, total], ignore_index=True)
-        total_fire_count = fire_counts_df.loc[fire_counts_df["District"] == "Total", "Fire Count"].values[0]
-
-    try:
-        fire_counts_df.to_excel(OUTPUT_EXCEL, index=False, engine='openpyxl')
-        print(f"Excel saved: {OUTPUT_EXCEL}")
-    except Exception as e:
-        print(f"Excel export error: {e}")
-
-    try:
-        fire_gdf = fire_gdf.cx[
-            nepal_districts_gdf.total_bounds[0]:nepal_districts_gdf.total_bounds[2],
-            nepal_districts_gdf.total_bounds[1]:nepal_districts_gdf.total_bounds[3]
-        ]
-        plot_fire_map(
-            fire_gdf,
-            DISTRICT_PLOT_SHP,
-            PROTECTED_AREAS_SHP,
-            FIRE_ICON_PATH,
-            NORTH_ARROW_PATH,
-            OUTPUT_IMG_PATH
+        result["detections"] = columns
+
+    if stats_only:
+        export_summaries(result, paths, report)
+        return result
+    # Stats and confidence are written with the other artifacts below
+    export_summaries(result, paths, report, names=("summary",))
+
+    fire_gdf = fire_gdf.cx[
+        attribution_index.bounds[0]:attribution_index.bounds[2],
+        attribution_index.bounds[1]:attribution_index.bounds[3]
+    ]
+    report_date = datetime.strptime(date_str, '%Y%m%d').date()
+    generate_artifacts(fire_gdf, fires_in_nepal, fire_counts_df, total_fire_count, confidence_data, stats, events,
+                       paths, report_date, satellite, workers=workers, show_pdf=show_pdf, report=report, prune=prune)
+    return result
+
+def run(stats_only=False):
+    """Run the daily pipeline for today and return its in-memory results, or None if it stopped early
+
+    With stats_only, only the district counts and confidence JSON are written and
+    no rendering library is imported. Every stage is timed into
+    fire_reports/run_report_<date>.json.
+    """
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    date_str = datetime.now().strftime('%Y%m%d')
+    paths = report_paths(date_str)
+
+    with RunReport(date_str, paths["run_report"]) as report:
+        with report.stage("download") as stage:
+            zip_paths = download_feeds(FIRMS_URLS, DOWNLOAD_DIR)
+            if not zip_paths:
+                return stage.fail("no FIRMS feed downloaded")
+            stage.rows_out = len(zip_paths)
+
+        outputs = report_outputs(paths, stats_only)
+        if (all(feed_already_processed(FIRMS_URLS[sensor]) for sensor in zip_paths)
+                and all(os.path.exists(path) for path in outputs.values())):
+            print("FIRMS payloads unchanged since the last run; today's reports are up to date.")
+            report.path = paths["run_report_skipped"]
+            report.status = "skipped"
+            return {"date": date_str, "skipped": True, "outputs": outputs}
+
+        with report.stage("ingest", rows_in=len(zip_paths)) as stage:
+            sensor_detections = read_feeds(zip_paths)
+            fire_gdf = combine_detections(sensor_detections.values())
+            if fire_gdf is None:
+                return stage.fail("no detections read")
+            stage.rows_out = len(fire_gdf)
+
+        result = process_detections(
+            fire_gdf, date_str, stats_only=stats_only, satellite=satellite_label(sensor_detections), report=report
         )
-        print(f"Map saved: {OUTPUT_IMG_PATH}")
-    except Exception as e:
-        print(f"Map export error: {e}")
+        if result is not None:
+            for sensor in sensor_detections:
+                mark_feed_processed(FIRMS_URLS[sensor])
+        return result
 
-    # Overlay fire icon at pixel (140, 1458) and overwrite the map image
-    try:
-        overlay_icon_on_map(
-            OUTPUT_IMG_PATH,
-            FIRE_ICON_PATH,
-            OUTPUT_IMG_PATH,  # Overwrite the same file, so only one image is produced
-            icon_x=140,
-            icon_y=1458,
-            zoom=0.16
-        )
-    except Exception as e:
-        print(f"Error overlaying fire icon: {e}")
+def main():
+    parser = argparse.ArgumentParser(description="Build Nepal's daily fire reports from NASA FIRMS detections.")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="only write district counts and confidence JSON; skip the Excel, map and PDF")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="also write a cProfile dump of every stage into DIR")
+    parser.add_argument("--marker-renderer", metavar="NAME",
+                        help="fire marker renderer: raster (default) or annotation, one artist per point "
+                             "(sets FIRE_MARKER_RENDERER)")
+    args = parser.parse_args()
+    if args.profile:
+        run_report.PROFILE_DIR = args.profile
+    if args.marker_renderer:
+        from map_layers import selected_marker_renderer
+
+        # Set in the environment so the processes that render the map see it too
+        os.environ["FIRE_MARKER_RENDERER"] = args.marker_renderer
+        try:
+            selected_marker_renderer()
+        except ValueError as e:
+            parser.error(str(e))
 
-    # --- Generate PDF ---
-    try:
-        now = datetime.now()
-        english_date_str = now.strftime("%d %B %Y")
-        nepali_date_str = nepali_datetime.date.from_datetime_date(now.date()).strftime("%d %B %Y")
-        assessed_time_str = now.strftime("%I:%M %p")
-
-        generate_fire_report_pdf(
-            pdf_path=OUTPUT_PDF_PATH,
-            fire_count=total_fire_count,
-            english_date=english_date_str,
-            nepali_date=nepali_date_str,
-            assessed_time=assessed_time_str,
-            fire_map_path=OUTPUT_IMG_PATH,
-            fire_counts_df=fire_counts_df
-        )
-        open_pdf(OUTPUT_PDF_PATH)
-    except Exception as e:
-        print(f"PDF export error: {e}")
+    run(stats_only=args.stats_only)
 
-    try:
-        shutil.rmtree(DOWNLOAD_DIR)
-    except Exception as e:
-        print(f"Cleanup warning: {e}")
+    if args.stats_only:
+        print(f"Stats-only run: startup {STARTUP_SECONDS:.2f} s, "
+              f"total {time.perf_counter() - _STARTUP_BEGAN:.2f} s, peak RSS {peak_rss_mb():.1f} MB")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+import io
+from functools import lru_cache
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import (
+    SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle, PageBreak, Flowable
+)
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from PIL import Image as PILImage
+
+from map_layers import PDF_MAP_PRINT_WIDTH, PDF_MAP_QUALITY, PDF_MAP_WIDTH, encode_image, resize_to_width
+
+# Width the map is printed at (A4 is 595 points wide, so this leaves a good margin)
+MAP_PRINT_WIDTH = PDF_MAP_PRINT_WIDTH
+# Write image streams as binary rather than ASCII85: smaller files, and it skips reportlab's pure-Python encoder
+rl_config.useA85 = 0
+
+class Divider(Flowable):
+    def __init__(self, width=480, thickness=0.8, color=colors.grey, space_before=10, space_after=10):
+        Flowable.__init__(self)
+        self.width = width
+        self.thickness = thickness
+        self.color = color
+        self.space_before = space_before
+        self.space_after = space_after
+
+    def wrap(self, availWidth, availHeight):
+        return (self.width, self.thickness + self.space_before + self.space_after)
+
+    def draw(self):
+        self.canv.saveState()
+        self.canv.setStrokeColor(self.color)
+        self.canv.setLineWidth(self.thickness)
+        y = self.space_before + self.thickness / 2
+        self.canv.line(0, y, self.width, y)
+        self.canv.restoreState()
+
+class ReportTemplate:
+    """Styles, static flowables and table style shared by every report built in this process"""
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.heading_style = styles['Heading1']
+        self.desc_style = ParagraphStyle(
+            'desc',
+            parent=styles['Normal'],
+            fontSize=12,
+            leading=16,
+            spaceAfter=16
+        )
+        self.footer_style = ParagraphStyle('footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey)
+        self.title = Paragraph("Nepal Daily Fire Report", self.heading_style)
+        self.table_title = Paragraph("Fire Counts by District", self.heading_style)
+        self.divider = Divider(width=MAP_PRINT_WIDTH)
+        self.light_divider = Divider(width=MAP_PRINT_WIDTH, color=colors.lightgrey)
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#e0f2e0")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor("#000000")),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ])
+
+    def footer(self, canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawString(doc.leftMargin, doc.bottomMargin / 2, "Source: NASA FIRMS")
+        canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"Page {doc.page}")
+        canvas.restoreState()
+
+@lru_cache(maxsize=1)
+def report_template():
+    return ReportTemplate()
+
+def report_dates(report_date):
+    """English and Nepali (Bikram Sambat) date strings printed on a report"""
+    import nepali_datetime
+
+    english_date = report_date.strftime("%d %B %Y")
+    nepali_date = nepali_datetime.date.from_datetime_date(report_date).strftime("%d %B %Y")
+    return english_date, nepali_date
+
+def embedded_map(fire_map, fire_map_size=None):
+    """Return (image source, (width, height) in pixels) with the map downsampled to its printed size
+
+    fire_map may be a path or an in-memory JPEG buffer. Maps already at or below
+    the printed resolution, such as encode_map_variants' PDF variant, are embedded
+    as they are, without re-encoding; larger ones (a print master) are resampled once.
+    """
+    target_width = PDF_MAP_WIDTH
+    if fire_map_size is not None and fire_map_size[0] <= target_width:
+        return fire_map, fire_map_size
+
+    image = PILImage.open(fire_map)
+    if image.width <= target_width:
+        if hasattr(fire_map, "seek"):
+            fire_map.seek(0)
+        return fire_map, image.size
+    resized = resize_to_width(image.convert("RGB"), target_width)
+    buffer = io.BytesIO(encode_image(resized, "JPEG", quality=PDF_MAP_QUALITY, optimize=True))
+    return buffer, resized.size
+
+def generate_fire_report_pdf(
+    pdf_path,
+    fire_count,
+    english_date,
+    nepali_date,
+    assessed_time,
+    fire_map,
+    fire_counts_df,
+    fire_map_size=None,
+    satellite="MODIS 1km"
+):
+    template = report_template()
+
+    desc = (
+        f"<b>{fire_count}</b> fires have been detected in Nepal as of "
+        f"<b>{english_date} ({nepali_date})</b> in the past 24 hours.<br/>"
+        "(Note: For landscape level data, please contact us.)<br/><br/>"
+        f"<b>Satellite:</b> {satellite}<br/>"
+        f"<b>Assessed Time:</b> {assessed_time}<br/><br/>"
+        "(Source: https://firms.modaps.eosdis.nasa.gov/active_fire/ )"
+    )
+
+    elements = []
+    elements.append(template.title)
+    elements.append(Spacer(1, 12))
+    elements.append(Paragraph(desc, template.desc_style))
+    elements.append(Spacer(1, 8))
+    elements.append(template.divider)
+    elements.append(Spacer(1, 8))
+
+    # --- Fit map image to page width with margin, keep aspect ratio ---
+    fire_map, (img_width, img_height) = embedded_map(fire_map, fire_map_size)
+    display_width = MAP_PRINT_WIDTH
+    display_height = display_width * img_height / img_width
+    elements.append(RLImage(fire_map, width=display_width, height=display_height))
+    elements.append(Spacer(1, 8))
+    elements.append(template.light_divider)
+    elements.append(PageBreak())
+
+    # --- Table on second page ---
+    elements.append(template.table_title)
+    elements.append(Spacer(1, 8))
+    elements.append(template.light_divider)
+    elements.append(Spacer(1, 8))
+
+    table_data = [fire_counts_df.columns.tolist()] + fire_counts_df.fillna("").astype(str).values.tolist()
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(template.table_style)
+    elements.append(table)
+
+    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
+    doc.build(elements, onFirstPage=template.footer, onLaterPages=template.footer)
+    print(f"PDF saved: {pdf_path}")
+
+def generate_fire_reports_pdf(reports):
+    """Build many reports in one process, sharing the template; each item holds generate_fire_report_pdf's arguments
+
+    Returns the paths written. A failing report is reported and skipped.
+    """
+    written = []
+    for report in reports:
+        try:
+            generate_fire_report_pdf(**report)
+            written.append(report["pdf_path"])
+        except Exception as e:
+            print(f"PDF export error for {report.get('pdf_path')}: {e}")
+    return written
@@ -0,0 +1,241 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import fire_monitor
+from daily_summary import build_summary
+from detection_store import DetectionStore
+from detection_stats import RunningStatistics, confidence_summary
+from fire_events import EVENT_COLUMNS, cluster_events
+from firms_feed import (
+    acquisition_minutes, combine_detections, dedupe_detections, download_feeds, load_feed_state, read_feeds,
+    satellite_label
+)
+from spatial_index import load_attribution_index
+
+# Make update_web_data (at the repository root) importable when run as scripts/fire_watch.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POLL_MINUTES = 10
+# The Excel, map and PDF are rebuilt at most this often; counts and today.json follow every poll
+REGENERATE_MINUTES = 60
+
+
+def detection_keys(fire_gdf):
+    """Identity of each detection: position to 1e-4 degrees, acquisition minute and sensor"""
+    return pd.MultiIndex.from_arrays([
+        (fire_gdf.geometry.y.to_numpy() * 1e4).round().astype("int64"),
+        (fire_gdf.geometry.x.to_numpy() * 1e4).round().astype("int64"),
+        acquisition_minutes(fire_gdf),
+        fire_gdf["SENSOR"].astype(str).to_numpy(),
+    ])
+
+
+class FireWatch:
+    """Incremental state of one day's detections while polling the FIRMS feeds"""
+
+    def __init__(self, urls, regenerate_minutes=REGENERATE_MINUTES):
+        self.urls = urls
+        self.regenerate_seconds = regenerate_minutes * 60
+        self.attribution_index = load_attribution_index(fire_monitor.ATTRIBUTION_LAYERS)
+        self.feed_hashes = {}
+        self.start_day(datetime.now().strftime('%Y%m%d'))
+
+    def start_day(self, date_str):
+        self.date_str = date_str
+        self.seen = None
+        # Detections kept after cross-sensor dedupe, and those of them inside Nepal, both indexed by arrival id
+        self.kept = None
+        self.attributed = None
+        self.next_id = 0
+        self.statistics = RunningStatistics(
+            fire_monitor.DISTRICT_COLUMN_NAME, fire_monitor.LOCAL_UNIT_COLUMN_NAME,
+            fire_monitor.PROTECTED_AREA_COLUMN_NAME
+        )
+        # Clustering needs the whole day's points, so events are only refreshed with the heavy artifacts
+        self.events = pd.DataFrame(columns=EVENT_COLUMNS)
+        # Whether today's store partition has been written by this watch; later polls only apply deltas
+        self.stored = False
+        self.sensors = set()
+        self.last_regenerated = None
+        self.pending_regeneration = False
+
+    def changed_feeds(self, zip_paths):
+        """Sensors whose downloaded payload differs from the one seen at the previous poll"""
+        state = load_feed_state()
+        hashes = {sensor: state.get(self.urls[sensor], {}).get("sha256") for sensor in zip_paths}
+        changed = {sensor: path for sensor, path in zip_paths.items() if hashes[sensor] != self.feed_hashes.get(sensor)}
+        self.feed_hashes.update(hashes)
+        return changed
+
+    def merge(self, new):
+        """Dedupe new detections against the kept ones; return (new detections kept, ids of kept ones now dropped)
+
+        A higher-priority sensor arriving after a coincident lower-priority one
+        replaces it, so the day ends with the detections the daily run keeps.
+        """
+        new = new.set_axis(pd.RangeIndex(self.next_id, self.next_id + len(new)))
+        self.next_id += len(new)
+        if self.kept is None:
+            self.kept = dedupe_detections(new)
+            return self.kept, pd.Index([])
+        candidates = pd.concat([self.kept, new])
+        candidates["SENSOR"] = pd.Categorical(candidates["SENSOR"], categories=new["SENSOR"].cat.categories)
+        kept = dedupe_detections(candidates)
+        dropped = self.kept.index.difference(kept.index)
+        self.kept = kept
+        return kept.loc[kept.index.intersection(new.index)], dropped
+
+    def poll(self):
+        """Fetch the feeds and attribute only detections not seen before today; return how many were new"""
+        date_str = datetime.now().strftime('%Y%m%d')
+        if date_str != self.date_str:
+            print(f"New day {date_str}; starting a fresh report")
+            self.start_day(date_str)
+            self.feed_hashes = {}
+
+        zip_paths = download_feeds(self.urls, fire_monitor.DOWNLOAD_DIR)
+        changed = self.changed_feeds(zip_paths)
+        if not changed:
+            return 0
+
+        detections = combine_detections(read_feeds(zip_paths).values())
+        if detections is None or detections.empty:
+            return 0
+        keys = detection_keys(detections)
+        is_new = ~keys.isin(self.seen) if self.seen is not None else np.ones(len(keys), dtype=bool)
+        new = detections[is_new]
+        self.seen = keys if self.seen is None else self.seen.append(keys[is_new])
+        if new.empty:
+            return 0
+
+        new, dropped = self.merge(new)
+        removed = None
+        if len(dropped) and self.attributed is not None:
+            removed = self.attributed.loc[self.attributed.index.intersection(dropped)]
+        if new.crs != self.attribution_index.crs:
+            new = new.to_crs(self.attribution_index.crs)
+        added = self.attribution_index.join(new, fire_monitor.ATTRIBUTION_COLUMNS)
+        replaced = 0 if removed is None else len(removed)
+        print(f"{len(new)} new detections, {len(added)} in Nepal, {replaced} replaced by another sensor's")
+        if added.empty and not replaced:
+            return len(new)
+
+        if removed is not None:
+            self.attributed = self.attributed.drop(removed.index)
+        self.attributed = added if self.attributed is None else pd.concat([self.attributed, added])
+        self.sensors.update(added["SENSOR"].astype(str).unique())
+        self.pending_regeneration = True
+        self.publish(added, removed)
+        return len(new)
+
+    def result(self):
+        """The day's accumulated results in the shape fire_monitor.process_detections returns"""
+        stats = self.statistics.statistics()
+        fire_counts_df, total_fire_count = fire_monitor.fire_counts_table(stats)
+        confidence = confidence_summary(stats)
+        events = self.events
+        satellite = satellite_label(self.sensors)
+        paths = fire_monitor.report_paths(self.date_str)
+        return {
+            "date": self.date_str,
+            "skipped": False,
+            "fire_counts": fire_counts_df,
+            "total_fires": int(total_fire_count),
+            "confidence": confidence,
+            "stats": stats,
+            "events": events,
+            "satellite": satellite,
+            "summary": build_summary(self.date_str, stats, confidence, events, satellite),
+            "outputs": fire_monitor.report_outputs(paths),
+        }
+
+    def publish(self, added=None, removed=None):
+        """Apply a poll's added and removed detections to the counts and detection store, then write the
+        daily summary and today.json, regenerating the heavy artifacts if due
+
+        The day's store partition is written in full once and then only
+        changed by each poll's delta.
+        """
+        self.statistics.update(added, removed)
+        regenerate = self.regeneration_due()
+        if regenerate:
+            self.events = cluster_events(self.attributed, fire_monitor.DISTRICT_COLUMN_NAME)
+        result = self.result()
+        paths = fire_monitor.report_paths(self.date_str)
+        fire_monitor.export_summaries(result, paths)
+        if added is not None or removed is not None:
+            try:
+                with DetectionStore() as store:
+                    if not self.stored:
+                        store.write_day(self.date_str, **fire_monitor.detection_columns(self.attributed))
+                        self.stored = True
+                    else:
+                        store.update_day(
+                            self.date_str,
+                            added=fire_monitor.detection_columns(added) if added is not None else None,
+                            removed=fire_monitor.detection_columns(removed) if removed is not None else None
+                        )
+            except Exception as e:
+                print(f"Detection store error: {e}")
+
+        if regenerate:
+            self.regenerate(result, paths)
+
+        import update_web_data
+        update_web_data.update_today_json(fire_report=result)
+
+    def regeneration_due(self):
+        if not self.pending_regeneration:
+            return False
+        return self.last_regenerated is None or time.monotonic() - self.last_regenerated >= self.regenerate_seconds
+
+    def regenerate(self, result, paths):
+        """Rebuild the Excel workbooks, web map layer, map and PDF from everything seen today"""
+        report_date = datetime.strptime(self.date_str, '%Y%m%d').date()
+        fire_monitor.generate_artifacts(
+            self.attributed, self.attributed, result["fire_counts"], result["total_fires"], result["confidence"],
+            result["stats"], result["events"], paths, report_date, result["satellite"], show_pdf=False
+        )
+        self.last_regenerated = time.monotonic()
+        self.pending_regeneration = False
+
+
+def watch(poll_minutes=POLL_MINUTES, regenerate_minutes=REGENERATE_MINUTES, once=False):
+    """Poll the FIRMS feeds until interrupted, updating today's counts and dashboard as detections arrive"""
+    os.makedirs(fire_monitor.OUTPUT_FOLDER, exist_ok=True)
+    state = FireWatch(fire_monitor.FIRMS_URLS, regenerate_minutes)
+    try:
+        while True:
+            try:
+                state.poll()
+                # A regeneration held back by the debounce is caught up once it is due, even without new points
+                if state.regeneration_due():
+                    state.publish()
+            except Exception as e:
+                print(f"Watch poll error: {e}")
+            if once:
+                break
+            time.sleep(poll_minutes * 60)
+    except KeyboardInterrupt:
+        print("Stopping fire watch.")
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll NASA FIRMS and keep today's Nepal fire reports up to date.")
+    parser.add_argument("--interval", type=float, default=POLL_MINUTES, help="minutes between polls")
+    parser.add_argument("--regenerate-every", type=float, default=REGENERATE_MINUTES,
+                        help="minimum minutes between rebuilding the Excel, map and PDF")
+    parser.add_argument("--once", action="store_true", help="poll a single time and exit")
+    args = parser.parse_args()
+    watch(args.interval, args.regenerate_every, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
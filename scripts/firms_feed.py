@@ -0,0 +1,304 @@
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import requests
+
+from file_utils import CACHE_DIR, file_sha256, write_json_atomic
+
+# Nepal's extent in WGS84 lon/lat (the FIRMS feed CRS), padded slightly beyond the border
+NEPAL_BBOX = (79.9, 26.2, 88.3, 30.6)
+# Attributes the pipeline uses; everything else in the feed is never parsed
+FIRE_COLUMNS = ["CONFIDENCE", "FRP", "ACQ_DATE", "ACQ_TIME", "DAYNIGHT"]
+
+FIRMS_ACTIVE_FIRE_URL = "https://firms.modaps.eosdis.nasa.gov/data/active_fire"
+# 24h South Asia feed of each sensor; each URL can be overridden with FIRMS_URL_<SENSOR>
+FIRMS_FEEDS = {
+    "MODIS": f"{FIRMS_ACTIVE_FIRE_URL}/modis-c6.1/shapes/zips/MODIS_C6_1_South_Asia_24h.zip",
+    "VIIRS_SNPP": f"{FIRMS_ACTIVE_FIRE_URL}/suomi-npp-viirs-c2/shapes/zips/SUOMI_VIIRS_C2_South_Asia_24h.zip",
+    "VIIRS_NOAA20": f"{FIRMS_ACTIVE_FIRE_URL}/noaa-20-viirs-c2/shapes/zips/J1_VIIRS_C2_South_Asia_24h.zip",
+}
+SENSOR_LABELS = {
+    "MODIS": "MODIS 1km",
+    "VIIRS_SNPP": "VIIRS S-NPP 375m",
+    "VIIRS_NOAA20": "VIIRS NOAA-20 375m",
+}
+# When detections of several sensors coincide, the earliest sensor here is kept (finer footprint first)
+SENSOR_PRIORITY = ("VIIRS_SNPP", "VIIRS_NOAA20", "MODIS")
+# VIIRS reports confidence as low/nominal/high; these are the midpoints of MODIS's 0-30/30-80/80-100 classes
+VIIRS_CONFIDENCE = {"l": 15.0, "n": 55.0, "h": 90.0}
+# Detections of different sensors within one grid cell (or a neighbouring one) and time bucket are duplicates
+DEDUPE_CELL_DEGREES = 0.01  # about 1 km, the MODIS footprint
+DEDUPE_WINDOW_MINUTES = 20
+
+# Validators and payload hashes of previous downloads, keyed by URL
+FEED_STATE_PATH = os.path.join(CACHE_DIR, "firms_state.json")
+# Feeds are downloaded from several threads which all update the one state file
+_FEED_STATE_LOCK = threading.Lock()
+DOWNLOAD_RETRIES = 4
+DOWNLOAD_BACKOFF = 2.0  # seconds before the first retry, doubled after each failure
+DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def load_feed_state(state_path=FEED_STATE_PATH):
+    """Return the saved per-URL download state, or an empty dict"""
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_feed_entry(url, entry, state_path=FEED_STATE_PATH):
+    """Store one URL's download state, re-reading the file so concurrent downloads do not drop each other's entries"""
+    with _FEED_STATE_LOCK:
+        state = load_feed_state(state_path)
+        state[url] = entry
+        write_json_atomic(state_path, state)
+
+
+def download_file(url, target_dir, state_path=FEED_STATE_PATH, retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF):
+    """Fetch url into target_dir with conditional requests, Range resume and retries; return the local path or None"""
+    os.makedirs(target_dir, exist_ok=True)
+    local_filename = os.path.join(target_dir, url.split('/')[-1])
+    partial_filename = local_filename + ".part"
+    entry = load_feed_state(state_path).get(url, {})
+    validator = entry.get("etag") or entry.get("last_modified")
+
+    attempt = 0
+    restarted = False
+    while attempt <= retries:
+        headers = {}
+        resume_from = os.path.getsize(partial_filename) if os.path.exists(partial_filename) else 0
+        if resume_from and validator:
+            # If-Range makes the server send the whole file instead if it changed since the partial transfer
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["If-Range"] = validator
+        elif os.path.exists(local_filename):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+                if r.status_code == 304:
+                    print(f"FIRMS feed not modified: {url}")
+                    if not entry.get("sha256"):
+                        # Files fetched before hashes were recorded could otherwise never be marked processed
+                        entry["sha256"] = file_sha256(local_filename)
+                        save_feed_entry(url, entry, state_path)
+                    return local_filename
+                if r.status_code == 416:
+                    # The partial file no longer matches the remote payload; start the transfer over,
+                    # the first time without counting it as a failed attempt
+                    os.remove(partial_filename)
+                    if not restarted:
+                        restarted = True
+                        continue
+                r.raise_for_status()
+
+                # Remember validators before the body so an interrupted transfer can be resumed
+                entry["etag"] = r.headers.get("ETag")
+                entry["last_modified"] = r.headers.get("Last-Modified")
+                validator = entry["etag"] or entry["last_modified"]
+                save_feed_entry(url, entry, state_path)
+
+                mode = 'ab' if r.status_code == 206 else 'wb'
+                with open(partial_filename, mode) as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+            os.replace(partial_filename, local_filename)
+            entry["sha256"] = file_sha256(local_filename)
+            save_feed_entry(url, entry, state_path)
+            return local_filename
+        except requests.exceptions.RequestException as e:
+            if attempt == retries:
+                print(f"Download error: {e}")
+                return None
+            delay = backoff * 2 ** attempt
+            print(f"Download attempt {attempt + 1} failed ({e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+            attempt += 1
+    print(f"Download error: no attempts left for {url}")
+    return None
+
+
+def feed_already_processed(url, state_path=FEED_STATE_PATH):
+    """Return True if the last downloaded payload for url has the same hash as the last processed one"""
+    entry = load_feed_state(state_path).get(url, {})
+    return bool(entry.get("sha256")) and entry.get("sha256") == entry.get("processed_sha256")
+
+
+def mark_feed_processed(url, state_path=FEED_STATE_PATH):
+    """Record the current payload hash for url as fully processed"""
+    entry = load_feed_state(state_path).get(url, {})
+    if entry.get("sha256"):
+        entry["processed_sha256"] = entry["sha256"]
+        save_feed_entry(url, entry, state_path)
+
+
+def find_zip_shapefile(zip_path):
+    """Return the name of the first .shp member inside a zip archive, or None"""
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        shp_names = [name for name in zip_ref.namelist() if name.lower().endswith('.shp')]
+    return shp_names[0] if shp_names else None
+
+
+def read_fire_detections(zip_path, bbox=NEPAL_BBOX, columns=FIRE_COLUMNS):
+    """Read FIRMS detections straight out of the downloaded zip, filtered to bbox and columns by the reader"""
+    shp_name = find_zip_shapefile(zip_path)
+    if shp_name is None:
+        return None
+    # GDAL's virtual zip filesystem lets the reader seek inside the archive without extracting it
+    vsi_path = f"/vsizip/{os.path.abspath(zip_path)}/{shp_name}"
+    return gpd.read_file(vsi_path, bbox=bbox, columns=columns)
+
+
+def read_fire_csv(csv_path, bbox=NEPAL_BBOX, columns=FIRE_COLUMNS):
+    """Read FIRMS detections from an archive CSV export, filtered to bbox and columns like read_fire_detections"""
+    wanted = set(columns) | {"LATITUDE", "LONGITUDE"}
+    frame = pd.read_csv(csv_path, usecols=lambda name: name.upper() in wanted)
+    frame.columns = [name.upper() for name in frame.columns]
+    frame = frame[frame["LONGITUDE"].between(bbox[0], bbox[2]) & frame["LATITUDE"].between(bbox[1], bbox[3])]
+    if "ACQ_TIME" in frame.columns:
+        # CSV exports drop the leading zeros the shapefile keeps (e.g. 517 vs "0517")
+        frame = frame.assign(ACQ_TIME=frame["ACQ_TIME"].astype(str).str.zfill(4))
+    return gpd.GeoDataFrame(
+        frame[[name for name in columns if name in frame.columns]].reset_index(drop=True),
+        geometry=gpd.points_from_xy(frame["LONGITUDE"], frame["LATITUDE"]),
+        crs="EPSG:4326"
+    )
+
+
+def sensor_from_name(name):
+    """Guess the sensor of a FIRMS file from its name (J1_VIIRS..., SUOMI_VIIRS..., MODIS...)"""
+    name = os.path.basename(name).upper()
+    if "J1" in name or "NOAA" in name:
+        return "VIIRS_NOAA20"
+    if "VIIRS" in name or "SUOMI" in name or "SNPP" in name:
+        return "VIIRS_SNPP"
+    return "MODIS"
+
+
+def normalize_detections(fire_gdf, sensor):
+    """Bring one sensor's detections into the shared schema: numeric CONFIDENCE plus a SENSOR column"""
+    if "CONFIDENCE" in fire_gdf.columns and not pd.api.types.is_numeric_dtype(fire_gdf["CONFIDENCE"]):
+        confidence = fire_gdf["CONFIDENCE"].astype(str).str[:1].str.lower().map(VIIRS_CONFIDENCE)
+        fire_gdf = fire_gdf.assign(CONFIDENCE=confidence.astype(float))
+    return fire_gdf.assign(SENSOR=pd.Categorical([sensor] * len(fire_gdf), categories=SENSOR_PRIORITY))
+
+
+def read_detection_file(path, sensor=None):
+    """Read and normalize a FIRMS zip or CSV, taking the sensor from the file name unless given"""
+    if path.lower().endswith(".csv"):
+        fire_gdf = read_fire_csv(path)
+    else:
+        fire_gdf = read_fire_detections(path)
+    if fire_gdf is None:
+        return None
+    return normalize_detections(fire_gdf, sensor or sensor_from_name(path))
+
+
+def acquisition_minutes(fire_gdf):
+    """Minutes since the epoch of each detection's ACQ_DATE/ACQ_TIME, or zeros if they are missing"""
+    if "ACQ_DATE" not in fire_gdf.columns or "ACQ_TIME" not in fire_gdf.columns:
+        return np.zeros(len(fire_gdf), dtype=np.int64)
+    days = pd.to_datetime(fire_gdf["ACQ_DATE"]).to_numpy().astype("datetime64[m]").astype(np.int64)
+    hhmm = pd.to_numeric(fire_gdf["ACQ_TIME"], errors="coerce").fillna(0).to_numpy().astype(np.int64)
+    return days + hhmm // 100 * 60 + hhmm % 100
+
+
+def dedupe_detections(fire_gdf, cell_degrees=DEDUPE_CELL_DEGREES, window_minutes=DEDUPE_WINDOW_MINUTES):
+    """Drop detections that another, higher-priority sensor already reported nearby at about the same time
+
+    Each detection is hashed to an integer (grid cell, time bucket) key. A
+    sensor's detections are kept unless their key is in the neighbourhood
+    (adjacent cells and buckets) of a detection kept from a higher-priority
+    sensor, which is one vectorized set lookup per sensor. Detections of the
+    same sensor are never merged with each other.
+    """
+    if fire_gdf.empty or fire_gdf["SENSOR"].nunique() < 2:
+        return fire_gdf
+    x = np.floor((fire_gdf.geometry.x.to_numpy() + 180) / cell_degrees).astype(np.int64)
+    y = np.floor((fire_gdf.geometry.y.to_numpy() + 90) / cell_degrees).astype(np.int64)
+    t = acquisition_minutes(fire_gdf) // window_minutes
+    columns, rows = int(np.ceil(360 / cell_degrees)) + 2, int(np.ceil(180 / cell_degrees)) + 2
+
+    def keys(dx, dy, dt):
+        return ((t + dt) * rows + (y + dy)) * columns + (x + dx)
+
+    neighbour_offsets = [(dx, dy, dt) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dt in (-1, 0, 1)]
+    own_keys = keys(0, 0, 0)
+    sensors = fire_gdf["SENSOR"].to_numpy()
+    keep = np.ones(len(fire_gdf), dtype=bool)
+    claimed = np.empty(0, dtype=np.int64)
+    for sensor in SENSOR_PRIORITY:
+        mask = sensors == sensor
+        if not mask.any():
+            continue
+        # Membership by binary search in the sorted claimed keys; cheaper than hashing for millions of keys
+        candidates = own_keys[mask]
+        positions = np.minimum(np.searchsorted(claimed, candidates), max(len(claimed) - 1, 0))
+        keep[mask] = claimed[positions] != candidates if len(claimed) else True
+        kept = mask & keep
+        claimed = np.sort(np.concatenate([claimed] + [keys(*offset)[kept] for offset in neighbour_offsets]))
+    return fire_gdf[keep]
+
+
+def combine_detections(frames):
+    """Concatenate normalized per-sensor detections and remove cross-sensor duplicates"""
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return None
+    combined = pd.concat(frames, ignore_index=True)
+    combined["SENSOR"] = pd.Categorical(combined["SENSOR"], categories=SENSOR_PRIORITY)
+    return dedupe_detections(gpd.GeoDataFrame(combined, geometry="geometry", crs=frames[0].crs))
+
+
+def parse_sensors(value):
+    """Sensor names from a comma-separated list such as FIRMS_SENSORS, blanks dropped; raises ValueError for unknown names"""
+    sensors = list(dict.fromkeys(name.strip().upper() for name in value.split(",") if name.strip()))
+    unknown = [sensor for sensor in sensors if sensor not in FIRMS_FEEDS]
+    if unknown:
+        raise ValueError(f"Unknown FIRMS sensor {', '.join(unknown)}; valid names are {', '.join(FIRMS_FEEDS)}")
+    return sensors
+
+
+def download_feeds(feeds, target_dir, state_path=FEED_STATE_PATH):
+    """Download every sensor's feed concurrently; return {sensor: local path} for the downloads that worked"""
+    if not feeds:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(feeds)) as executor:
+        futures = {sensor: executor.submit(download_file, url, target_dir, state_path) for sensor, url in feeds.items()}
+    return {sensor: future.result() for sensor, future in futures.items() if future.result()}
+
+
+def read_feeds(paths):
+    """Read and normalize each sensor's downloaded feed concurrently; return {sensor: detections}
+
+    A feed that cannot be read is reported and left out so the other sensors still count.
+    """
+    def read(sensor, path):
+        try:
+            return read_detection_file(path, sensor)
+        except Exception as e:
+            print(f"Error reading {sensor} detections: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, len(paths))) as executor:
+        futures = {sensor: executor.submit(read, sensor, path) for sensor, path in paths.items()}
+    return {sensor: future.result() for sensor, future in futures.items() if future.result() is not None}
+
+
+def satellite_label(sensors):
+    """Human-readable names of the given sensors, in a fixed order"""
+    return ", ".join(SENSOR_LABELS[sensor] for sensor in SENSOR_LABELS if sensor in sensors)
@@ -0,0 +1,185 @@
+import io
+import json
+import os
+
+import numpy as np
+import shapely
+from PIL import Image as PILImage
+
+from file_utils import CACHE_DIR, hash_files
+
+# Bump when the base map drawing changes so cached layers are re-rendered
+BASE_MAP_CACHE_VERSION = 2
+# Fire marker renderers, chosen with FIRE_MARKER_RENDERER: "raster" stamps every icon into one image layer,
+# "annotation" draws one AnnotationBbox per point (the slower original, kept for comparison)
+MARKER_RENDERERS = ("raster", "annotation")
+MARKER_RENDERER_ENV = "FIRE_MARKER_RENDERER"
+# Upper bound on (points x icon pixels) handled per vectorized stamping step
+STAMP_CHUNK_PIXELS = 4_000_000
+# Derived map variants: the dashboard image and the archive list thumbnail, in pixels wide
+WEB_MAP_WIDTH = 1200
+THUMBNAIL_WIDTH = 240
+WEB_MAP_QUALITY = 80
+THUMBNAIL_QUALITY = 70
+# The PDF prints the map PDF_MAP_PRINT_WIDTH points wide (A4 is 595) at PDF_MAP_DPI
+PDF_MAP_PRINT_WIDTH = 480
+PDF_MAP_DPI = 150
+PDF_MAP_WIDTH = round(PDF_MAP_PRINT_WIDTH / 72 * PDF_MAP_DPI)
+PDF_MAP_QUALITY = 85
+
+
+def selected_marker_renderer():
+    """The marker renderer named by FIRE_MARKER_RENDERER (unset means "raster"); raises ValueError for unknown names"""
+    renderer = os.environ.get(MARKER_RENDERER_ENV, "").strip().lower() or MARKER_RENDERERS[0]
+    if renderer not in MARKER_RENDERERS:
+        raise ValueError(
+            f"Unknown {MARKER_RENDERER_ENV} {renderer}; valid renderers are {', '.join(MARKER_RENDERERS)}"
+        )
+    return renderer
+
+
+def scale_icon(icon, zoom, dpi):
+    """Resize an icon to the pixel size OffsetImage(icon, zoom) is drawn at for dpi, as uint8 RGBA"""
+    if icon.dtype != np.uint8:
+        icon = (np.clip(icon, 0, 1) * 255).round().astype(np.uint8)
+    pil_icon = PILImage.fromarray(icon).convert("RGBA")
+    scale = zoom * dpi / 72.0
+    size = (max(1, round(pil_icon.width * scale)), max(1, round(pil_icon.height * scale)))
+    return np.asarray(pil_icon.resize(size, PILImage.LANCZOS))
+
+
+def stamp_icons(canvas, icon, cols, rows):
+    """Stamp an RGBA icon centred on every (col, row) pixel position of an RGBA canvas"""
+    cols = np.asarray(cols, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+    height, width = icon.shape[:2]
+    icon_y, icon_x = np.nonzero(icon[..., 3] > 0)
+    if len(cols) == 0 or len(icon_y) == 0:
+        return canvas
+    icon_pixels = icon[icon_y, icon_x]
+
+    lefts = np.floor(cols).astype(np.int64) - width // 2
+    tops = np.floor(rows).astype(np.int64) - height // 2
+    chunk = max(1, STAMP_CHUNK_PIXELS // len(icon_y))
+    # Later points are written after earlier ones, matching the draw order of one artist per point
+    for start in range(0, len(cols), chunk):
+        ys = tops[start:start + chunk, None] + icon_y[None, :]
+        xs = lefts[start:start + chunk, None] + icon_x[None, :]
+        visible = (ys >= 0) & (ys < canvas.shape[0]) & (xs >= 0) & (xs < canvas.shape[1])
+        pixel_idx = np.broadcast_to(np.arange(len(icon_y)), ys.shape)[visible]
+        canvas[ys[visible], xs[visible]] = icon_pixels[pixel_idx]
+    return canvas
+
+
+def add_marker_layer(ax, xs, ys, icon, zoom, dpi, zorder=3):
+    """Draw an icon at every data point as a single raster image artist on ax"""
+    fig = ax.figure
+    ax.apply_aspect()
+    position = ax.get_position()
+    fig_width, fig_height = fig.get_size_inches()
+    width = max(1, round(position.width * fig_width * dpi))
+    height = max(1, round(position.height * fig_height * dpi))
+
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    cols = (np.asarray(xs, dtype=np.float64) - x0) / (x1 - x0) * width
+    rows = (y1 - np.asarray(ys, dtype=np.float64)) / (y1 - y0) * height
+
+    layer = np.zeros((height, width, 4), dtype=np.uint8)
+    stamp_icons(layer, scale_icon(icon, zoom, dpi), cols, rows)
+    ax.imshow(layer, extent=(x0, x1, y0, y1), origin="upper", interpolation="none",
+              aspect=ax.get_aspect(), zorder=zorder)
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+
+
+def project_to_pixels(georef, xs, ys):
+    """Convert data coordinates to (col, row) pixel positions in a georeferenced base map"""
+    left, top, width, height = georef["axes_px"]
+    x0, x1 = georef["xlim"]
+    y0, y1 = georef["ylim"]
+    cols = left + (np.asarray(xs, dtype=np.float64) - x0) / (x1 - x0) * width
+    rows = top + (y1 - np.asarray(ys, dtype=np.float64)) / (y1 - y0) * height
+    return cols, rows
+
+
+def composite_markers(base_image, icon, cols, rows):
+    """Return base_image (PIL RGBA) with the icon alpha-composited at every pixel position"""
+    layer = np.zeros((base_image.height, base_image.width, 4), dtype=np.uint8)
+    stamp_icons(layer, icon, cols, rows)
+    return PILImage.alpha_composite(base_image, PILImage.fromarray(layer))
+
+
+def encode_jpeg(image, dpi):
+    """Encode a PIL image as JPEG into a rewound in-memory buffer"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", dpi=(dpi, dpi))
+    buffer.seek(0)
+    return buffer
+
+
+def resize_to_width(image, width):
+    """Downscale a PIL image to width pixels, keeping its aspect ratio; smaller images are returned as is"""
+    if image.width <= width:
+        return image
+    return image.resize((width, round(image.height * width / image.width)), PILImage.LANCZOS)
+
+
+def encode_image(image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def encode_map_variants(image, dpi):
+    """Encode one rendered map as the print master JPEG, a web progressive JPEG and WebP, a thumbnail and the PDF image
+
+    Returns ({variant: encoded bytes}, PDF image size); the variants are resampled
+    from the same raster, so the map is only drawn once and each variant is
+    JPEG-compressed once.
+    """
+    web = resize_to_width(image, WEB_MAP_WIDTH)
+    web_dpi = dpi * web.width / image.width
+    thumbnail = resize_to_width(web, THUMBNAIL_WIDTH)
+    pdf = resize_to_width(image, PDF_MAP_WIDTH)
+    variants = {
+        "print": encode_jpeg(image, dpi).getvalue(),
+        "pdf": encode_image(pdf, "JPEG", quality=PDF_MAP_QUALITY, optimize=True, dpi=(PDF_MAP_DPI, PDF_MAP_DPI)),
+        "web": encode_image(web, "JPEG", quality=WEB_MAP_QUALITY, optimize=True, progressive=True,
+                            dpi=(web_dpi, web_dpi)),
+        "webp": encode_image(web, "WEBP", quality=WEB_MAP_QUALITY, method=4),
+        "thumbnail": encode_image(thumbnail, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True),
+    }
+    return variants, pdf.size
+
+
+def load_base_map(resource_paths, dpi, render, cache_dir=CACHE_DIR):
+    """Return (image, georef, clip geometry) for the static base map, calling render(dpi) only on a cache miss"""
+    key = hash_files(resource_paths, extra=f"v{BASE_MAP_CACHE_VERSION}")[:16]
+    stem = os.path.join(cache_dir, "basemap", f"basemap_{key}_{dpi}")
+
+    if all(os.path.exists(stem + ext) for ext in (".png", ".json", ".wkb")):
+        try:
+            image = PILImage.open(stem + ".png").convert("RGBA")
+            with open(stem + ".json") as f:
+                georef = json.load(f)
+            with open(stem + ".wkb", "rb") as f:
+                clip_geometry = shapely.from_wkb(f.read())
+            shapely.prepare(clip_geometry)
+            return image, georef, clip_geometry
+        except Exception as e:
+            print(f"Base map cache unreadable, re-rendering: {e}")
+
+    image, georef, clip_geometry = render(dpi)
+    try:
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        image.save(stem + ".png")
+        with open(stem + ".wkb", "wb") as f:
+            f.write(shapely.to_wkb(clip_geometry))
+        # The georeference is written last so a partial write is never mistaken for a complete entry
+        with open(stem + ".json", "w") as f:
+            json.dump(georef, f, indent=2)
+    except OSError as e:
+        print(f"Base map cache write warning: {e}")
+    shapely.prepare(clip_geometry)
+    return image, georef, clip_geometry
@@ -0,0 +1,203 @@
+import cProfile
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from file_utils import write_json_atomic
+
+RUN_REPORT_VERSION = 1
+# Directory for one cProfile dump per stage (<date>_<stage>.prof); unset means no profiling
+PROFILE_DIR = os.environ.get("FIRE_PROFILE_DIR")
+RUN_REPORT_PATTERN = os.path.join("fire_reports", "run_report_*.json")
+# Kept outside RUN_REPORT_PATTERN so the summary is never read back as a run
+RUN_REPORT_SUMMARY_PATH = os.path.join("fire_reports", "run_summary.json")
+
+
+def peak_rss_mb():
+    """High-water resident memory of this process so far, in MB (NaN where unavailable)"""
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform.startswith('darwin') else peak / 1024
+
+
+class Measurement:
+    """Wall time, CPU time and memory of one block of work, with an optional cProfile dump
+
+    peak_rss_mb is the process high-water mark when the block ended, so it only
+    rises across stages; peak_traced_mb is the block's own peak and is recorded
+    when tracemalloc is tracing (python -X tracemalloc).
+    """
+
+    def __init__(self, profile_path=None):
+        self.profile_path = profile_path
+        self.profiler = None
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        if self.profile_path:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def stop(self):
+        metrics = {
+            "wall_s": round(time.perf_counter() - self.wall, 4),
+            "cpu_s": round(time.process_time() - self.cpu, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        if tracemalloc.is_tracing():
+            metrics["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        if self.profiler:
+            self.profiler.disable()
+            os.makedirs(os.path.dirname(self.profile_path) or ".", exist_ok=True)
+            self.profiler.dump_stats(self.profile_path)
+            metrics["profile"] = self.profile_path
+        return metrics
+
+
+def measured_call(function, args, profile_path=None):
+    """Call function(*args) and return (its value, metrics); used to measure artifacts inside pool workers"""
+    measurement = Measurement(profile_path).start()
+    value = function(*args)
+    return value, measurement.stop()
+
+
+class Stage:
+    """One stage's record inside a RunReport; set rows_in/rows_out, or call fail() for a handled failure"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.error = None
+
+    def fail(self, error):
+        """Mark the stage failed (its caller handled the error); returns None so callers can `return stage.fail(e)`"""
+        self.error = str(error)
+        return None
+
+
+class RunReport:
+    """Per-stage timing, memory and row counts of one pipeline run, written as JSON when the run ends
+
+    Used as a context manager around the run: stages are recorded with
+    `with report.stage(name) as stage:` and the report is written on exit,
+    including after an error.
+    """
+
+    def __init__(self, date_str, path, profile_dir=None):
+        self.date_str = date_str
+        self.path = path
+        self.profile_dir = profile_dir or PROFILE_DIR
+        self.started = datetime.now()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.stages = []
+        self.status = "ok"
+
+    def profile_path(self, name):
+        return os.path.join(self.profile_dir, f"{self.date_str}_{name}.prof") if self.profile_dir else None
+
+    def stage(self, name, rows_in=None):
+        return _StageContext(self, name, rows_in)
+
+    def add(self, name, metrics=None, rows_in=None, rows_out=None, error=None):
+        """Record a stage measured elsewhere (e.g. in a worker process)"""
+        record = {"stage": name, "status": "error" if error else "ok"}
+        record.update(metrics or {})
+        record.update({"rows_in": rows_in, "rows_out": rows_out})
+        if error:
+            record["error"] = str(error)
+            self.status = "error"
+        self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            "version": RUN_REPORT_VERSION,
+            "date": self.date_str,
+            "started": self.started.isoformat(timespec="seconds"),
+            "status": self.status,
+            "wall_s": round(time.perf_counter() - self.wall, 4),
+            "cpu_s": round(time.process_time() - self.cpu, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": self.stages,
+        }
+
+    def write(self):
+        try:
+            write_json_atomic(self.path, self.to_dict())
+        except OSError as e:
+            print(f"Run report write error: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.status = "error"
+        self.write()
+        return False
+
+
+class _StageContext:
+    def __init__(self, report, name, rows_in):
+        self.report = report
+        self.stage = Stage(name)
+        self.stage.rows_in = rows_in
+
+    def __enter__(self):
+        self.measurement = Measurement(self.report.profile_path(self.stage.name)).start()
+        return self.stage
+
+    def __exit__(self, exc_type, exc, traceback):
+        metrics = self.measurement.stop()
+        error = exc if exc is not None else self.stage.error
+        self.report.add(self.stage.name, metrics, self.stage.rows_in, self.stage.rows_out, error)
+        return False
+
+
+def summarize_run_reports(pattern=RUN_REPORT_PATTERN):
+    """Add up the stages of every run report matching pattern: runs, failures and total/mean/max wall time per stage"""
+    stages = {}
+    runs = 0
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping unreadable run report {path}: {e}")
+            continue
+        if not isinstance(report, dict) or not isinstance(report.get("stages"), list):
+            print(f"Skipping {path}: not a run report")
+            continue
+        runs += 1
+        for record in report["stages"]:
+            if not isinstance(record, dict) or "stage" not in record:
+                continue
+            summary = stages.setdefault(record["stage"], {
+                "runs": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0, "max_peak_rss_mb": 0.0,
+            })
+            summary["runs"] += 1
+            summary["errors"] += record.get("status") == "error"
+            summary["wall_s"] += record.get("wall_s") or 0.0
+            summary["cpu_s"] += record.get("cpu_s") or 0.0
+            summary["max_wall_s"] = max(summary["max_wall_s"], record.get("wall_s") or 0.0)
+            summary["max_peak_rss_mb"] = max(summary["max_peak_rss_mb"], record.get("peak_rss_mb") or 0.0)
+
+    for summary in stages.values():
+        summary["mean_wall_s"] = summary["wall_s"] / summary["runs"]
+        for key in ("wall_s", "cpu_s", "max_wall_s", "mean_wall_s"):
+            summary[key] = round(summary[key], 4)
+    ordered = dict(sorted(stages.items(), key=lambda item: item[1]["wall_s"], reverse=True))
+    return {"runs": runs, "stages": ordered}
@@ -0,0 +1,150 @@
+import os
+import pickle
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import CRS
+
+from file_utils import CACHE_DIR, hash_files, shapefile_components
+
+# Bump when the cached payload layout changes so stale pickles are rebuilt
+INDEX_CACHE_VERSION = 1
+
+
+def first_matches(point_idx, polygon_idx, n_points):
+    """Position of the first matching polygon for each of n_points query points, or -1 if none matched"""
+    positions = np.full(n_points, -1, dtype=np.int64)
+    if len(point_idx):
+        # Points on a shared edge can match twice; keep the first polygon like a stable join would
+        order = np.lexsort((polygon_idx, point_idx))
+        point_idx, polygon_idx = point_idx[order], polygon_idx[order]
+        first = np.flatnonzero(np.concatenate(([True], point_idx[1:] != point_idx[:-1])))
+        positions[point_idx[first]] = polygon_idx[first]
+    return positions
+
+
+class PolygonIndex:
+    """STRtree over prepared polygons answering point-in-polygon for a whole batch at once"""
+
+    def __init__(self, geometries, attributes, crs):
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.attributes = attributes.reset_index(drop=True)
+        self.crs = CRS.from_user_input(crs)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.bounds = shapely.total_bounds(self.geometries)
+
+    def lookup(self, points):
+        """Return the position of the polygon containing each point, or -1 if none does"""
+        points = np.asarray(getattr(points, "values", points), dtype=object)
+        if len(points) == 0:
+            return np.full(0, -1, dtype=np.int64)
+        return first_matches(*self.tree.query(points, predicate="within"), len(points))
+
+    def join(self, points_gdf, columns):
+        """Keep only the points inside a polygon and attach the requested polygon attributes"""
+        positions = self.lookup(points_gdf.geometry)
+        inside = positions >= 0
+        joined = points_gdf[inside].copy()
+        for column in columns:
+            joined[column] = self.attributes[column].to_numpy()[positions[inside]]
+        return joined
+
+
+class AttributionIndex:
+    """Several polygon layers behind one STRtree, attributing each point to a polygon of every layer in one query
+
+    The first layer is the base: only points inside its bounding box are queried
+    at all, and only points inside one of its polygons are kept by join(). The
+    tree's envelope test is the coarse pass; the prepared polygons refine it.
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+        self.names = list(layers)
+        base = layers[self.names[0]]
+        for name, index in layers.items():
+            if index.crs != base.crs:
+                raise ValueError(f"layer {name} is in {index.crs.name}, not the base layer's {base.crs.name}")
+        self.crs = base.crs
+        self.bounds = base.bounds
+        sizes = [len(index.geometries) for index in layers.values()]
+        self.layer_of = np.repeat(np.arange(len(sizes)), sizes)
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.tree = shapely.STRtree(np.concatenate([index.geometries for index in layers.values()]))
+
+    def lookup(self, points):
+        """Return {layer name: position of the polygon containing each point, or -1}"""
+        points = np.asarray(getattr(points, "values", points), dtype=object)
+        positions = {name: np.full(len(points), -1, dtype=np.int64) for name in self.names}
+        if len(points) == 0:
+            return positions
+
+        x, y = shapely.get_x(points), shapely.get_y(points)
+        min_x, min_y, max_x, max_y = self.bounds
+        candidates = np.flatnonzero((x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))
+        point_idx, polygon_idx = self.tree.query(points[candidates], predicate="within")
+        point_idx = candidates[point_idx]
+        layer_idx = self.layer_of[polygon_idx]
+        for layer, name in enumerate(self.names):
+            in_layer = layer_idx == layer
+            positions[name] = first_matches(
+                point_idx[in_layer], polygon_idx[in_layer] - self.offsets[layer], len(points)
+            )
+        return positions
+
+    def join(self, points_gdf, columns):
+        """Keep the points inside a base-layer polygon and attach {layer: {source column: output column}}
+
+        Points outside every polygon of a non-base layer get missing values for its columns.
+        """
+        positions = self.lookup(points_gdf.geometry)
+        inside = positions[self.names[0]] >= 0
+        joined = points_gdf[inside].copy()
+        for name, layer_columns in columns.items():
+            layer_positions = positions[name][inside]
+            matched = layer_positions >= 0
+            for source, target in layer_columns.items():
+                values = np.full(len(joined), None, dtype=object)
+                values[matched] = self.layers[name].attributes[source].to_numpy()[layer_positions[matched]]
+                joined[target] = values
+        return joined
+
+
+def load_attribution_index(shp_paths):
+    """AttributionIndex over {layer name: shapefile}, the first being the base layer; each layer is cached on disk"""
+    return AttributionIndex({name: load_polygon_index(path) for name, path in shp_paths.items()})
+
+
+def load_polygon_index(shp_path, cache_dir=CACHE_DIR):
+    """Load a PolygonIndex for a shapefile, reusing the on-disk cache while the shapefile is unchanged"""
+    key = hash_files(shapefile_components(shp_path), extra=f"v{INDEX_CACHE_VERSION}")
+    name = os.path.splitext(os.path.basename(shp_path))[0]
+    cache_path = os.path.join(cache_dir, "spatial_index", f"{name}_{key[:16]}.pkl")
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            return PolygonIndex(shapely.from_wkb(cached["wkb"]), cached["attributes"], cached["crs"])
+        except Exception as e:
+            print(f"Spatial index cache unreadable, rebuilding: {e}")
+
+    gdf = gpd.read_file(shp_path)
+    index = PolygonIndex(gdf.geometry.values, gdf.drop(columns=gdf.geometry.name), gdf.crs)
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "wkb": shapely.to_wkb(index.geometries),
+                "attributes": index.attributes,
+                "crs": index.crs.to_wkt(),
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Spatial index cache write warning: {e}")
+
+    return index
@@ -0,0 +1,195 @@
+import argparse
+from datetime import date as date_cls, timedelta
+
+# Rolling aggregates kept per ingested day. Days without a report count as zero fires;
+# days_7/days_30 record how many days in each window actually had a report.
+TREND_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trend_state (
+    date TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    rolling_7 INTEGER NOT NULL,
+    days_7 INTEGER NOT NULL,
+    rolling_30 INTEGER NOT NULL,
+    days_30 INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS district_trend (
+    date TEXT NOT NULL,
+    district TEXT NOT NULL,
+    rolling_7 INTEGER NOT NULL,
+    PRIMARY KEY (date, district)
+);
+"""
+
+LONGEST_WINDOW = 30
+# 52 weeks back lands on the same weekday, so the 7-day windows line up
+SAME_WEEK_LAST_YEAR_OFFSET = 364
+
+
+def shift(date, days):
+    return (date_cls.fromisoformat(date) + timedelta(days=days)).isoformat()
+
+
+def percent_change(current, previous):
+    """Change from previous to current in the {"change", "direction"} shape used by today.json"""
+    if not previous:
+        return {"change": 100 if current > 0 else 0, "direction": "up" if current > 0 else "same"}
+    change_pct = (current - previous) / previous * 100
+    direction = "up" if change_pct > 0 else "down" if change_pct < 0 else "same"
+    return {"change": abs(round(change_pct)), "direction": direction}
+
+
+def day_total(conn, date):
+    row = conn.execute("SELECT total FROM days WHERE date = ?", (date,)).fetchone()
+    return row[0] if row else None
+
+
+def window_totals(conn, date, days):
+    """Return (fires, reported days) over the window of `days` days ending on date, scanning only that window"""
+    row = conn.execute(
+        "SELECT COALESCE(SUM(total), 0), COUNT(*) FROM days WHERE date BETWEEN ? AND ?",
+        (shift(date, -(days - 1)), date)
+    ).fetchone()
+    return row[0], row[1]
+
+
+def district_counts(conn, date):
+    return dict(conn.execute("SELECT district, count FROM district_counts WHERE date = ?", (date,)).fetchall())
+
+
+def scratch_state(conn, date):
+    """Compute a day's aggregates directly from the daily tables"""
+    rolling_7, days_7 = window_totals(conn, date, 7)
+    rolling_30, days_30 = window_totals(conn, date, 30)
+    districts = dict(conn.execute(
+        "SELECT district, SUM(count) FROM district_counts WHERE date BETWEEN ? AND ? GROUP BY district",
+        (shift(date, -6), date)
+    ).fetchall())
+    state = (day_total(conn, date) or 0, rolling_7, days_7, rolling_30, days_30)
+    return state, districts
+
+
+def incremental_state(conn, date):
+    """Advance the previous day's aggregates by one day, or return None if that day has no state"""
+    yesterday = shift(date, -1)
+    previous = conn.execute(
+        "SELECT rolling_7, days_7, rolling_30, days_30 FROM trend_state WHERE date = ?", (yesterday,)
+    ).fetchone()
+    if previous is None:
+        return None
+
+    total = day_total(conn, date) or 0
+    leaving_7 = day_total(conn, shift(date, -7))
+    leaving_30 = day_total(conn, shift(date, -30))
+    state = (
+        total,
+        previous[0] + total - (leaving_7 or 0),
+        previous[1] + 1 - (leaving_7 is not None),
+        previous[2] + total - (leaving_30 or 0),
+        previous[3] + 1 - (leaving_30 is not None),
+    )
+
+    districts = dict(conn.execute(
+        "SELECT district, rolling_7 FROM district_trend WHERE date = ?", (yesterday,)
+    ).fetchall())
+    for district, count in district_counts(conn, date).items():
+        districts[district] = districts.get(district, 0) + count
+    for district, count in district_counts(conn, shift(date, -7)).items():
+        districts[district] = districts.get(district, 0) - count
+    return state, districts
+
+
+def store_state(conn, date, state, districts):
+    conn.execute("INSERT OR REPLACE INTO trend_state VALUES (?, ?, ?, ?, ?, ?)", (date,) + tuple(state))
+    conn.execute("DELETE FROM district_trend WHERE date = ?", (date,))
+    conn.executemany(
+        "INSERT INTO district_trend VALUES (?, ?, ?)",
+        [(date, district, count) for district, count in districts.items() if count > 0]
+    )
+
+
+def update_trends(conn, date):
+    """Refresh the aggregates touched by ingesting date
+
+    Only the reported days inside the longest window starting at date are
+    recomputed, each from its predecessor, so the cost does not grow with the
+    length of the history. Re-ingesting an old day therefore also stays cheap.
+    """
+    affected = conn.execute(
+        "SELECT date FROM days WHERE date BETWEEN ? AND ? ORDER BY date",
+        (date, shift(date, LONGEST_WINDOW - 1))
+    ).fetchall()
+    for (day,) in affected:
+        state, districts = incremental_state(conn, day) or scratch_state(conn, day)
+        store_state(conn, day, state, districts)
+
+
+def recompute_trends(conn):
+    """Rebuild every day's aggregates from scratch"""
+    with conn:
+        conn.execute("DELETE FROM trend_state")
+        conn.execute("DELETE FROM district_trend")
+        for (day,) in conn.execute("SELECT date FROM days ORDER BY date").fetchall():
+            store_state(conn, day, *scratch_state(conn, day))
+
+
+def verify_trends(conn):
+    """Return the dates whose stored incremental aggregates differ from a from-scratch computation"""
+    mismatches = []
+    for (day,) in conn.execute("SELECT date FROM days ORDER BY date").fetchall():
+        stored = conn.execute(
+            "SELECT total, rolling_7, days_7, rolling_30, days_30 FROM trend_state WHERE date = ?", (day,)
+        ).fetchone()
+        stored_districts = dict(conn.execute(
+            "SELECT district, rolling_7 FROM district_trend WHERE date = ?", (day,)
+        ).fetchall())
+        state, districts = scratch_state(conn, day)
+        districts = {district: count for district, count in districts.items() if count > 0}
+        if stored is None or tuple(stored) != tuple(state) or stored_districts != districts:
+            mismatches.append(day)
+    return mismatches
+
+
+def window_state(conn, date, days):
+    """Return (fires, reported days) for the window ending on date, preferring stored aggregates"""
+    column = {7: "rolling_7, days_7", 30: "rolling_30, days_30"}[days]
+    row = conn.execute(f"SELECT {column} FROM trend_state WHERE date = ?", (date,)).fetchone()
+    return tuple(row) if row else window_totals(conn, date, days)
+
+
+def trend_summary(conn, date, top_districts=5):
+    """Rolling totals, their change against the previous window, and per-district 7-day moving averages"""
+    summary = {}
+    for days in (7, 30):
+        total, reported = window_state(conn, date, days)
+        previous, _ = window_state(conn, shift(date, -days), days)
+        summary[f"rolling_{days}"] = {"total": total, "days_reported": reported, **percent_change(total, previous)}
+
+    this_week, _ = window_state(conn, date, 7)
+    last_year, last_year_reported = window_state(conn, shift(date, -SAME_WEEK_LAST_YEAR_OFFSET), 7)
+    summary["same_week_last_year"] = (
+        {"total": last_year, **percent_change(this_week, last_year)} if last_year_reported else None
+    )
+
+    rows = conn.execute(
+        "SELECT district, rolling_7 FROM district_trend WHERE date = ? ORDER BY rolling_7 DESC LIMIT ?",
+        (date, top_districts)
+    ).fetchall()
+    summary["district_moving_average_7"] = {district: round(count / 7, 2) for district, count in rows}
+    return summary
+
+
+if __name__ == "__main__":
+    from detection_store import DETECTION_STORE_PATH, DetectionStore
+
+    parser = argparse.ArgumentParser(description="Maintain the rolling fire trend aggregates.")
+    parser.add_argument("--store", default=DETECTION_STORE_PATH, help="detection store to operate on")
+    parser.add_argument("--recompute", action="store_true", help="rebuild all aggregates from scratch")
+    args = parser.parse_args()
+
+    with DetectionStore(args.store) as store:
+        if args.recompute:
+            recompute_trends(store.conn)
+            print("Trend aggregates recomputed from scratch.")
+        else:
+            bad_dates = verify_trends(store.conn)
+            print(f"{len(bad_dates)} mismatching dates" + (f": {', '.join(bad_dates)}" if bad_dates else ""))
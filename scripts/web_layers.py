@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+
+import numpy as np
+import shapely
+
+from file_utils import hash_files, shapefile_components, write_json_atomic
+
+# Vector layers for the interactive web map, stored gzip-compressed for the browser to inflate
+LAYERS_DIR = os.path.join("data", "layers")
+BOUNDARIES_PATH = os.path.join(LAYERS_DIR, "boundaries.geojson.gz")
+# Source hash of the boundaries file, so it is only rebuilt when a shapefile changes
+BOUNDARIES_KEY_PATH = os.path.join(LAYERS_DIR, "boundaries.json")
+# Bump when the layer layout changes so cached boundaries are rebuilt
+WEB_LAYERS_VERSION = 1
+# ~100 m simplification and ~10 m coordinate grid for boundaries; ~1 m for the fire points
+BOUNDARY_SIMPLIFY_DEGREES = 0.001
+BOUNDARY_DECIMALS = 4
+POINT_DECIMALS = 5
+# Event centroids published to the web map per day, largest first; the events workbook keeps the rest
+EVENT_LAYER_LIMIT = 500
+# Detection columns carried into the point layer, and the short property names used for them
+POINT_PROPERTIES = {
+    "DISTRICT": "d",
+    "PROTECTED_AREA": "pa",
+    "CONFIDENCE": "c",
+    "FRP": "frp",
+    "ACQ_TIME": "t",
+    "SENSOR": "s",
+}
+
+
+def fire_layer_path(date):
+    """Path of the point layer for a YYYY-MM-DD date"""
+    return os.path.join(LAYERS_DIR, "fires", f"{date}.geojson.gz")
+
+
+def event_layer_path(date):
+    """Path of the event centroid layer for a YYYY-MM-DD date"""
+    return os.path.join(LAYERS_DIR, "events", f"{date}.geojson.gz")
+
+
+def event_layer(events_geojson_path, path, limit=EVENT_LAYER_LIMIT):
+    """Write the first limit event centroids of a report's events.geojson as a gzip-compressed layer"""
+    with open(events_geojson_path) as f:
+        collection = json.load(f)
+    features = collection["features"]
+    return write_gzip_json(path, {
+        "type": "FeatureCollection",
+        "features": features[:limit],
+        "total": len(features),
+    })
+
+
+def write_gzip_json(path, data):
+    """Write compact JSON through gzip atomically; the fixed mtime keeps identical layers byte-identical"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def quantize(geometries, decimals):
+    """Round every coordinate to the given number of decimals, repairing any self-intersections it creates"""
+    return shapely.make_valid(shapely.transform(geometries, lambda coords: np.round(coords, decimals)))
+
+
+def geometry_features(geometries, properties):
+    """GeoJSON features for the non-empty geometries"""
+    return [
+        {"type": "Feature", "geometry": json.loads(geometry), "properties": props}
+        for geometry, empty, props in zip(shapely.to_geojson(geometries), shapely.is_empty(geometries), properties)
+        if not empty
+    ]
+
+
+def boundary_layer(districts_shp, protected_areas_shp, path=BOUNDARIES_PATH, key_path=BOUNDARIES_KEY_PATH):
+    """Write simplified, quantized district and protected area outlines unless the cached file is current"""
+    import geopandas as gpd
+
+    sources = shapefile_components(districts_shp) + shapefile_components(protected_areas_shp)
+    key = hash_files(sources, extra=f"v{WEB_LAYERS_VERSION}")
+    try:
+        with open(key_path) as f:
+            if json.load(f).get("key") == key and os.path.exists(path):
+                return path
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    features = []
+    for layer, shp_path, name_field in (
+        ("district", districts_shp, "DISTRICT"),
+        ("protected_area", protected_areas_shp, "PAS_NAME"),
+    ):
+        gdf = gpd.read_file(shp_path)
+        if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+            gdf = gdf.to_crs("EPSG:4326")
+        geometries = shapely.simplify(gdf.geometry.values, BOUNDARY_SIMPLIFY_DEGREES, preserve_topology=True)
+        names = gdf[name_field].astype(str) if name_field in gdf.columns else [None] * len(gdf)
+        features += geometry_features(
+            quantize(geometries, BOUNDARY_DECIMALS), ({"layer": layer, "name": name} for name in names)
+        )
+
+    write_gzip_json(path, {"type": "FeatureCollection", "features": features})
+    write_json_atomic(key_path, {"key": key, "features": len(features)})
+    print(f"Web boundary layer rebuilt: {path}")
+    return path
+
+
+def fire_point_layer(detections, path):
+    """Write the day's attributed detections as a quantized, gzip-compressed GeoJSON point layer"""
+    if detections.crs is not None and not detections.crs.equals("EPSG:4326"):
+        detections = detections.to_crs("EPSG:4326")
+    lons = np.round(detections.geometry.x.to_numpy(), POINT_DECIMALS).tolist()
+    lats = np.round(detections.geometry.y.to_numpy(), POINT_DECIMALS).tolist()
+    columns = {}
+    for column, short in POINT_PROPERTIES.items():
+        if column not in detections.columns:
+            continue
+        values = detections[column]
+        if column in ("CONFIDENCE", "FRP"):
+            values = values.astype(float).round(1)
+        columns[short] = values.astype(object).where(values.notna(), None).tolist()
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {short: values[i] for short, values in columns.items()},
+        }
+        for i, (lon, lat) in enumerate(zip(lons, lats))
+    ]
+    return write_gzip_json(path, {"type": "FeatureCollection", "features": features})
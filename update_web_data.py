@@ -1,11 +1,19 @@
 import os
+import sys
 import json
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import glob
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from archive_index import upsert_archive_entry
+from daily_summary import SUMMARY_DIR, load_summary, summary_path
+from detection_store import DETECTION_STORE_PATH, DetectionStore, migrate_legacy_store
+from web_layers import BOUNDARIES_PATH, event_layer, event_layer_path, fire_layer_path
+
+# Uncompressed event dump written by earlier versions; the gzip event layer replaces it
+LEGACY_EVENTS_JSON_PATH = os.path.join("data", "events.json")
+
 
 def get_weather_condition(district=None):
     """Get current weather condition for Kathmandu, Nepal"""
@@ -61,112 +69,142 @@ def get_weather_condition(district=None):
         }
 
 
-def calculate_fire_trend():
-    """Calculate fire trend by comparing with previous day"""
+def trend_from_totals(today_fires, yesterday_fires):
+    """Percentage change between two daily totals"""
+    if yesterday_fires == 0:
+        if today_fires > 0:
+            return {"change": 100, "direction": "up"}
+        else:
+            return {"change": 0, "direction": "same"}
+    
+    change_pct = ((today_fires - yesterday_fires) / yesterday_fires) * 100
+    
+    direction = "up" if change_pct > 0 else "down" if change_pct < 0 else "same"
+    
+    return {"change": abs(round(change_pct)), "direction": direction}
+
+
+def calculate_fire_trend(today_fires=None):
+    """Calculate fire trend by comparing with previous day
+
+    today_fires can be passed in when the caller already has today's total.
+    Totals come from the detection store when it holds both days; older
+    history falls back to the daily summaries.
+    """
     try:
-        # Get today's date and yesterday's date
         today = datetime.now().strftime('%Y%m%d')
-        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-        
-        # Path to today's and yesterday's fire reports
-        today_excel = f"fire_reports/nepal_daily_fire_report_{today}.xlsx"
-        yesterday_excel = f"fire_reports/nepal_daily_fire_report_{yesterday}.xlsx"
-        
-        # If no report for yesterday, check for any previous reports
-        if not os.path.exists(yesterday_excel):
-            files = glob.glob("fire_reports/nepal_daily_fire_report_*.xlsx")
-            files.sort(reverse=True)
-            if len(files) > 1:  # If we have more than just today's file
-                yesterday_excel = files[1]  # Second most recent file
-            else:
-                return {"change": 0, "direction": "same"}
 
-        # Read the Excel files
-        today_df = pd.read_excel(today_excel)
-        yesterday_df = pd.read_excel(yesterday_excel)
-        
-        # Calculate total fires (excluding "Total" row)
-        today_fires = today_df[today_df["District"] != "Total"]["Fire Count"].sum()
-        yesterday_fires = yesterday_df[yesterday_df["District"] != "Total"]["Fire Count"].sum()
-        
-        # Calculate percentage change
-        if yesterday_fires == 0:
-            if today_fires > 0:
-                return {"change": 100, "direction": "up"}
-            else:
-                return {"change": 0, "direction": "same"}
-        
-        change_pct = ((today_fires - yesterday_fires) / yesterday_fires) * 100
-        
-        direction = "up" if change_pct > 0 else "down" if change_pct < 0 else "same"
-        
-        return {"change": abs(round(change_pct)), "direction": direction}
-    
+        yesterday_fires = None
+        if os.path.exists(DETECTION_STORE_PATH):
+            with DetectionStore(DETECTION_STORE_PATH) as store:
+                if today_fires is None:
+                    today_fires = store.day_total(today)
+                previous = store.previous_day(today)
+            if previous is not None:
+                yesterday_fires = previous[1]
+        if today_fires is not None and yesterday_fires is not None:
+            return trend_from_totals(today_fires, yesterday_fires)
+
+        # The most recent summary before today stands in for yesterday's
+        earlier = [path for path in glob.glob(os.path.join(SUMMARY_DIR, "fire_summary_*.json"))
+                   if os.path.basename(path)[len("fire_summary_"):-len(".json")] < today]
+        if not earlier:
+            return {"change": 0, "direction": "same"}
+
+        if today_fires is None:
+            today_fires = load_summary(summary_path(today))["total_fires"]
+        yesterday_fires = load_summary(max(earlier))["total_fires"]
+
+        return trend_from_totals(today_fires, yesterday_fires)
+
     except Exception as e:
         print(f"Error calculating fire trend: {e}")
         return {"change": 0, "direction": "same"}
 
 
-def get_confidence_levels(excel_path):
-    """Extract confidence from fire data JSON file"""
+def get_rolling_trends():
+    """Rolling 7/30-day totals, same week last year and district moving averages from the detection store"""
+    if not os.path.exists(DETECTION_STORE_PATH):
+        return None
     try:
-        # Get the date from the Excel file name
-        date_str = os.path.basename(excel_path).replace("nepal_daily_fire_report_", "").replace(".xlsx", "")
-        confidence_file = f"fire_reports/fire_confidence_{date_str}.json"
-        
-        # Check if confidence file exists
-        if os.path.exists(confidence_file):
-            with open(confidence_file, 'r') as f:
-                confidence_data = json.load(f)
-                return confidence_data
-        else:
-            print(f"Confidence file not found: {confidence_file}")
-            # If the file doesn't exist, provide default values
-            return {
-                "average": 80,
-                "median": 85,
-                "high_confidence_pct": 70,
-                "confidence_distribution": {
-                    "low": 10,
-                    "medium": 20, 
-                    "high": 70
-                }
-            }
+        with DetectionStore(DETECTION_STORE_PATH) as store:
+            return store.trends(datetime.now())
     except Exception as e:
-        print(f"Error getting confidence levels: {e}")
-        return {
-            "average": 80,
-            "median": 85,
-            "high_confidence_pct": 70
-        }
+        print(f"Error calculating rolling trends: {e}")
+        return None
+
+
+def get_protected_area_fires(summary):
+    """Fires per protected area, largest first, from the daily summary"""
+    areas = summary.get("protected_areas")
+    if areas is None:
+        return "Data not available"
+    return {"total": sum(areas.values()), "areas": areas}
+
+
+def update_event_layer(events_geojson_path, date):
+    """Write the day's largest fire events as the web map's event layer; returns its path or None"""
+    if os.path.exists(LEGACY_EVENTS_JSON_PATH):
+        os.remove(LEGACY_EVENTS_JSON_PATH)
+    if not os.path.exists(events_geojson_path):
+        return None
+    try:
+        return event_layer(events_geojson_path, event_layer_path(date))
+    except (OSError, json.JSONDecodeError, KeyError) as e:
+        print(f"Error writing fire event layer: {e}")
+        return None
+
+
+def get_map_variants(map_path):
+    """URLs of the print master and its web, WebP and thumbnail variants
+
+    Reports made before the variants existed only have the master: the JPEG
+    variants then fall back to it and the WebP is None.
+    """
+    stem = os.path.splitext(map_path)[0]
+    variants = {"print": map_path}
+    for name, path in (("web", f"{stem}_web.jpg"), ("thumbnail", f"{stem}_thumb.jpg")):
+        variants[name] = path if os.path.exists(path) else map_path
+    webp_path = f"{stem}_web.webp"
+    variants["webp"] = webp_path if os.path.exists(webp_path) else None
+    return {name: path and path.replace("\\", "/") for name, path in variants.items()}
 
 
-def update_today_json():
-    """Update today.json with the latest fire report data"""
+def update_today_json(fire_report=None):
+    """Update today.json with the latest fire report data
+
+    fire_report is the in-memory result of fire_monitor.run(); without its
+    summary, today's fire_summary JSON is read instead. No workbook is read.
+    """
     today = datetime.now().strftime('%Y%m%d')
+    # The trend lookups below only open the store if it exists at its current path
+    migrate_legacy_store()
     
     # Paths to the latest report files
     map_path = f"fire_reports/nepal_daily_fire_map_{today}.jpg"
+    map_variants = get_map_variants(map_path)
     excel_path = f"fire_reports/nepal_daily_fire_report_{today}.xlsx"
     pdf_path = f"fire_reports/nepal_daily_fire_report_{today}.pdf"
+    events_path = f"reports/{datetime.now().strftime('%Y-%m-%d')}/events.xlsx"
+    events_geojson_path = f"reports/{datetime.now().strftime('%Y-%m-%d')}/events.geojson"
+    layer_path = fire_layer_path(datetime.now().strftime('%Y-%m-%d'))
     
     # Check if files exist
     if not (os.path.exists(map_path) and os.path.exists(excel_path) and os.path.exists(pdf_path)):
         print("Error: Today's fire report files not found.")
         return False
         
-    # Read Excel file to get fire statistics
+    # Use the pipeline's in-memory summary when available, otherwise today's summary file
     try:
-        df = pd.read_excel(excel_path)
-        
-        # Get total fires (excluding "Total" row)
-        total_fires = df[df["District"] != "Total"]["Fire Count"].sum()
+        if fire_report and fire_report.get("summary") is not None:
+            summary = fire_report["summary"]
+        else:
+            summary = load_summary(summary_path(today))
         
-        # Get top district
-        district_rows = df[df["District"] != "Total"]
-        if not district_rows.empty:
-            top_district = district_rows.sort_values("Fire Count", ascending=False).iloc[0]
-            top_district_name = f"{top_district['District']} ({top_district['Fire Count']} fires)"
+        total_fires = summary["total_fires"]
+        top_district = summary["top_district"]
+        if top_district:
+            top_district_name = f"{top_district['name']} ({top_district['count']} fires)"
         else:
             top_district_name = "None (0 fires)"
             
@@ -176,31 +214,43 @@ def update_today_json():
         last_updated = datetime.now().strftime('%d %b %Y, %H:%M:%S')
         
         # Get additional statistics
-        fire_trend = calculate_fire_trend()
+        fire_trend = calculate_fire_trend(today_fires=total_fires)
+        rolling_trends = get_rolling_trends()
         weather = get_weather_condition()
-        confidence = get_confidence_levels(excel_path)
+        protected_areas = get_protected_area_fires(summary)
         
     except Exception as e:
-        print(f"Error reading Excel file: {e}")
+        print(f"Error reading daily summary: {e}")
         return False
     
+    events_layer_path = update_event_layer(events_geojson_path, today_date)
+    
     # Create today.json data
     today_data = {
         "date": formatted_date,
         "last_updated": last_updated,
-        "map_url": map_path.replace("\\", "/"),
+        "map_url": map_variants["web"],
+        "map_variants": map_variants,
         "stats": {
             "total_fires": int(total_fires),
             "top_district": top_district_name,
-            "protected_areas": "Data not available",
-            "satellite": "MODIS 1km",
+            "protected_areas": protected_areas,
+            "satellite": summary["satellite"],
             "fire_trend": fire_trend,
+            "rolling_trends": rolling_trends,
             "weather": weather,
-            "confidence": confidence
+            "confidence": summary["confidence"],
+            "fire_events": summary.get("events")
         },
         "reports": {
             "pdf": pdf_path.replace("\\", "/"),
-            "xlsx": excel_path.replace("\\", "/")
+            "xlsx": excel_path.replace("\\", "/"),
+            "events": events_path if os.path.exists(events_path) else None
+        },
+        "layers": {
+            "fires": layer_path.replace("\\", "/") if os.path.exists(layer_path) else None,
+            "boundaries": BOUNDARIES_PATH.replace("\\", "/") if os.path.exists(BOUNDARIES_PATH) else None,
+            "events": events_layer_path.replace("\\", "/") if events_layer_path else None
         },
         "year": datetime.now().year,
         "archive": []
@@ -214,51 +264,25 @@ def update_today_json():
         json.dump(today_data, f, indent=2)
     
     # Update archive.json
-    update_archive_json(today_date, map_path, pdf_path, excel_path, top_district_name.split(" (")[0])
+    update_archive_json(today_date, map_variants, pdf_path, excel_path, top_district_name.split(" (")[0])
     
     print(f"Updated today.json with data from {today}")
     return True
 
 
-def update_archive_json(date, map_path, pdf_path, excel_path, district):
-    """Update archive.json with new entry"""
-    archive_file = "data/archive.json"
-    
-    if os.path.exists(archive_file) and os.path.getsize(archive_file) > 0:
-        with open(archive_file, "r") as f:
-            try:
-                archive = json.load(f)
-            except json.JSONDecodeError:
-                archive = []
-    else:
-        archive = []
-    
-    # Create new entry
-    new_entry = {
+def update_archive_json(date, map_variants, pdf_path, excel_path, district):
+    """Add or replace the archive entry for date in its monthly shard"""
+    upsert_archive_entry({
         "date": date,
-        "map_url": map_path.replace("\\", "/"),
+        "map_url": map_variants["web"],
+        "map_print": map_variants["print"],
+        "thumbnail": map_variants["thumbnail"],
         "pdf": pdf_path.replace("\\", "/"),
         "xlsx": excel_path.replace("\\", "/"),
         "district": district
-    }
-    
-    # Check if entry for this date already exists
-    for i, entry in enumerate(archive):
-        if entry["date"] == date:
-            archive[i] = new_entry
-            break
-    else:
-        # Entry doesn't exist, add it
-        archive.append(new_entry)
-    
-    # Sort archive by date (newest first)
-    archive = sorted(archive, key=lambda x: x["date"], reverse=True)
-    
-    # Save archive.json
-    with open(archive_file, "w") as f:
-        json.dump(archive, f, indent=2)
+    })
     
-    print(f"Updated archive.json with entry for {date}")
+    print(f"Updated archive entry for {date}")
 
 
 if __name__ == "__main__":